@@ -0,0 +1,13 @@
+from alembic import op
+
+revision = "0004_place_city_cursor_index"
+down_revision = "0003_add_trips_and_trip_items"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # keyset pagination of /cities/{slug}/places walks (city_id, id)
+    op.create_index("idx_place_city_id_id", "places", ["city_id", "id"])
+
+def downgrade() -> None:
+    op.drop_index("idx_place_city_id_id", table_name="places")
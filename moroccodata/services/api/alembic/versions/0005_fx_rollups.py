@@ -0,0 +1,60 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_fx_rollups"
+down_revision = "0004_place_city_cursor_index"
+branch_labels = None
+depends_on = None
+
+def _rollup_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column("base", sa.String(length=8), primary_key=True),
+        sa.Column("quote", sa.String(length=8), primary_key=True),
+        sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("open", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.Column("mean", sa.Float(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+    )
+
+def upgrade() -> None:
+    # OHLC per pair per UTC hour/day, kept current by app.fx_rollups.insert_rates
+    _rollup_table("fx_rates_hourly")
+    _rollup_table("fx_rates_daily")
+
+    # backfill from existing captures
+    op.execute("""
+        INSERT INTO fx_rates_hourly (base, quote, bucket, open, high, low, close, mean, samples)
+        SELECT base, quote, bucket,
+               (array_agg(rate ORDER BY captured_at))[1],
+               MAX(rate), MIN(rate),
+               (array_agg(rate ORDER BY captured_at DESC))[1],
+               AVG(rate), COUNT(*)
+        FROM (
+            SELECT base, quote, rate, captured_at,
+                   date_trunc('hour', captured_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket
+            FROM fx_rates
+        ) r
+        GROUP BY base, quote, bucket
+    """)
+    op.execute("""
+        INSERT INTO fx_rates_daily (base, quote, bucket, open, high, low, close, mean, samples)
+        SELECT base, quote, bucket,
+               (array_agg(open ORDER BY hour))[1],
+               MAX(high), MIN(low),
+               (array_agg(close ORDER BY hour DESC))[1],
+               SUM(mean * samples) / SUM(samples), SUM(samples)
+        FROM (
+            SELECT base, quote, open, high, low, close, mean, samples, bucket AS hour,
+                   date_trunc('day', bucket AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket
+            FROM fx_rates_hourly
+        ) h
+        GROUP BY base, quote, bucket
+    """)
+
+def downgrade() -> None:
+    op.drop_table("fx_rates_daily")
+    op.drop_table("fx_rates_hourly")
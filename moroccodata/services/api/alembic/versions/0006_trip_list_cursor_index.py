@@ -0,0 +1,15 @@
+from alembic import op
+
+revision = "0006_trip_list_cursor_index"
+down_revision = "0005_fx_rollups"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # keyset pagination of GET /trips walks (created_at, id) per user or session
+    op.create_index("idx_trip_user_created", "trips", ["user_id", "created_at", "id"])
+    op.create_index("idx_trip_session_created", "trips", ["session_id", "created_at", "id"])
+
+def downgrade() -> None:
+    op.drop_index("idx_trip_session_created", table_name="trips")
+    op.drop_index("idx_trip_user_created", table_name="trips")
@@ -0,0 +1,197 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .core import redis as cache
+from .models import City, Place
+from .spatial import GridIndex
+from .search import fold
+from . import search
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable, in-memory view of the cities and places tables.
+
+    A snapshot is never mutated after it is built (row dicts are shared with
+    every reader and must be treated as read-only); a reseed produces a new
+    snapshot with a higher ``version`` which replaces the old one in a single
+    assignment, so readers always see a consistent catalog.
+
+    ``digest`` is a hash of the catalog contents. Unlike ``version`` it is
+    the same in every worker holding the same data, which makes it suitable
+    for strong HTTP ETags.
+
+    Snapshots are per process: each worker builds its own on first use and
+    swaps it when the seed or clear admin routes run in that worker. Those
+    routes also bump a generation counter in Redis, which ``get`` checks at
+    most every ``CATALOG_CHECK_INTERVAL`` seconds so other workers rebuild
+    too. Without Redis, workers other than the one that handled the admin
+    call keep their snapshot until they restart.
+    """
+
+    version: int
+    digest: str = ""
+    cities: tuple = ()
+    by_slug: Mapping[str, dict] = field(default_factory=dict)
+    places: Mapping[str, tuple] = field(default_factory=dict)
+    categories: Mapping[str, Mapping[str, int]] = field(default_factory=dict)
+    spatial: GridIndex = field(default_factory=lambda: GridIndex(()))
+    city_spatial: GridIndex = field(default_factory=lambda: GridIndex(()))
+
+    def city(self, slug: str) -> Optional[dict]:
+        return self.by_slug.get(slug)
+
+    def city_places(self, slug: str) -> tuple:
+        return self.places.get(slug, ())
+
+    def city_places_page(self, slug: str, after: int = 0, limit: Optional[int] = None) -> tuple:
+        """Places of a city with id greater than ``after``, in id order."""
+        places = self.city_places(slug)
+        start = bisect.bisect_right(places, after, key=lambda p: p["id"]) if after else 0
+        return places[start:start + limit] if limit else places[start:]
+
+    def city_categories(self, slug: str) -> Mapping[str, int]:
+        return self.categories.get(slug, MappingProxyType({}))
+
+    def list_cities(self, q: str = "", min_places: int = 0, category: str = "", sort: str = "name") -> list:
+        """In-memory equivalent of ``queries.city_list_query``.
+
+        Name matching is accent- and case-folded, so ``q="fes"`` finds "Fès".
+        """
+        needle = fold(q)
+        rows = []
+        for city in self.cities:
+            slug = city["slug"]
+            if needle and needle not in fold(city["name"]):
+                continue
+            if category and category not in self.city_categories(slug):
+                continue
+            count = len(self.city_places(slug))
+            if count < min_places:
+                continue
+            rows.append((city, count))
+        if sort == "popularity":
+            # cities are already name-ordered, so the stable sort keeps name as tie-breaker
+            rows.sort(key=lambda row: row[1], reverse=True)
+        return [city for city, _ in rows]
+
+
+# How often (seconds) a worker asks Redis whether another worker reseeded
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "2"))
+GENERATION_KEY = "catalog:generation"
+
+_versions = itertools.count(1)
+_snapshot: Optional[CatalogSnapshot] = None
+_lock = asyncio.Lock()
+# Redis generation the current snapshot was built at (None: unknown / no Redis)
+_generation: Optional[int] = None
+_checked_at = 0.0
+
+
+def current() -> Optional[CatalogSnapshot]:
+    """Return the active snapshot, or None if none has been built yet."""
+    return _snapshot
+
+
+async def build(db: AsyncSession) -> CatalogSnapshot:
+    """Read the whole catalog in two queries and freeze it into a snapshot."""
+    city_rows = (await db.execute(select(City).order_by(City.name))).scalars().all()
+    place_rows = (await db.execute(select(Place).order_by(Place.id))).scalars().all()
+
+    cities = []
+    by_slug = {}
+    slug_by_id = {}
+    for c in city_rows:
+        city = {"id": c.id, "slug": c.slug, "name": c.name, "lat": c.lat, "lon": c.lon}
+        cities.append(city)
+        by_slug[c.slug] = city
+        slug_by_id[c.id] = c.slug
+
+    places: dict[str, list] = {slug: [] for slug in by_slug}
+    categories: dict[str, dict] = {slug: {} for slug in by_slug}
+    points = []
+    for p in place_rows:
+        slug = slug_by_id.get(p.city_id)
+        if slug is None:
+            continue
+        place = {"id": p.id, "name": p.name, "category": p.category, "lat": p.lat, "lon": p.lon}
+        places[slug].append(place)
+        points.append((p.lat, p.lon, slug, place))
+        counts = categories[slug]
+        counts[p.category] = counts.get(p.category, 0) + 1
+
+    digest = hashlib.sha1()
+    for city in cities:
+        digest.update(repr(sorted(city.items())).encode())
+    for point in points:
+        digest.update(repr(sorted(point[3].items())).encode())
+
+    return CatalogSnapshot(
+        version=next(_versions),
+        digest=digest.hexdigest()[:20],
+        cities=tuple(cities),
+        by_slug=MappingProxyType(by_slug),
+        places=MappingProxyType({slug: tuple(rows) for slug, rows in places.items()}),
+        categories=MappingProxyType({slug: MappingProxyType(c) for slug, c in categories.items()}),
+        spatial=GridIndex(points),
+        city_spatial=GridIndex((c["lat"], c["lon"], c["slug"], c) for c in cities),
+    )
+
+
+async def _swap(db: AsyncSession, generation: Optional[int]) -> Optional[CatalogSnapshot]:
+    global _snapshot, _generation
+    try:
+        snapshot = await build(db)
+    except Exception as e:
+        print(f"Error building catalog snapshot: {e}")
+        return _snapshot
+    _snapshot = snapshot
+    _generation = generation
+    search.index.sync(snapshot)
+    return snapshot
+
+
+async def refresh(db: AsyncSession) -> Optional[CatalogSnapshot]:
+    """Rebuild the snapshot after a change and tell the other workers.
+
+    Keeps the previous snapshot on failure.
+    """
+    async with _lock:
+        return await _swap(db, await cache.counter_incr(GENERATION_KEY))
+
+
+async def _stale() -> Optional[int]:
+    """The newer Redis generation if another worker reseeded, else None."""
+    global _checked_at
+    now = time.monotonic()
+    if now - _checked_at < CATALOG_CHECK_INTERVAL:
+        return None
+    _checked_at = now
+    generation = await cache.counter_get(GENERATION_KEY)
+    return generation if generation is not None and generation != _generation else None
+
+
+async def get(db: AsyncSession) -> Optional[CatalogSnapshot]:
+    """Return the active snapshot, building it on first use.
+
+    Rebuilds it when another worker has reseeded since. Returns None when
+    the snapshot cannot be built so callers can fall back to querying the
+    database directly.
+    """
+    if _snapshot is not None and await _stale() is None:
+        return _snapshot
+    async with _lock:
+        generation = await cache.counter_get(GENERATION_KEY)
+        if _snapshot is not None and generation in (None, _generation):
+            return _snapshot
+        return await _swap(db, generation)
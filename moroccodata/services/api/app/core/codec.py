@@ -0,0 +1,203 @@
+"""Encoding of cached values.
+
+``CACHE_CODEC`` is ``<serializer>[+<compressor>]``:
+
+- serializers: ``json`` (stdlib), ``orjson``, ``msgpack``
+- compressors: ``zlib`` (stdlib), ``zstd`` (``zstandard`` package)
+
+Everything except plain ``json`` is written with a 5-byte header,
+``MC`` + format version + serializer id + compressor id, so any mix of
+formats can sit in Redis at once and every reader decodes all of them.
+Plain ``json`` writes the original headerless JSON text. To roll a new
+codec out, deploy the readers first, then switch ``CACHE_CODEC``. A codec
+whose package is missing (or an unknown name) falls back to its stdlib
+counterpart and prints an error; orjson, msgpack and zstandard are all in
+requirements.txt, so that only happens in a trimmed-down install.
+
+Run ``python -m app.core.codec [sample.json ...]`` to compare bytes per
+key and decode time across codecs.
+"""
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+HEADER = b"MC"
+VERSION = b"1"
+# payloads smaller than this are stored uncompressed (header says so)
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "512"))
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+_SERIALIZERS: dict[bytes, tuple[str, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    b"j": ("json", _json_dumps, json.loads),
+}
+_COMPRESSORS: dict[bytes, tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    b"-": ("none", lambda b: b, lambda b: b),
+    b"z": ("zlib", lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress),
+}
+
+try:
+    import orjson
+
+    _SERIALIZERS[b"o"] = ("orjson", orjson.dumps, orjson.loads)
+except ImportError:
+    pass
+
+try:
+    import msgpack
+
+    _SERIALIZERS[b"m"] = (
+        "msgpack",
+        lambda v: msgpack.packb(v, use_bin_type=True),
+        lambda b: msgpack.unpackb(b, raw=False),
+    )
+except ImportError:
+    pass
+
+try:
+    import zstandard
+
+    _zstd_c = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    _zstd_d = zstandard.ZstdDecompressor()
+    _COMPRESSORS[b"s"] = ("zstd", _zstd_c.compress, _zstd_d.decompress)
+except ImportError:
+    pass
+
+_FALLBACK = {"orjson": "json", "msgpack": "json", "zstd": "zlib"}
+
+
+class Codec:
+    """Serializer + optional compressor, selected by name (e.g. ``"msgpack+zstd"``)."""
+
+    def __init__(self, spec: str):
+        serializer, _, compressor = spec.lower().partition("+")
+        self.ser_id = self._resolve(_SERIALIZERS, serializer or "json", spec)
+        self.comp_id = self._resolve(_COMPRESSORS, compressor or "none", spec)
+        self.legacy = self.ser_id == b"j" and self.comp_id == b"-"
+        self.name = "+".join(
+            [_SERIALIZERS[self.ser_id][0]] + ([_COMPRESSORS[self.comp_id][0]] if self.comp_id != b"-" else [])
+        )
+
+    @staticmethod
+    def _resolve(table: dict, name: str, spec: str) -> bytes:
+        while True:
+            for ident, (known, _, _) in table.items():
+                if known == name:
+                    return ident
+            fallback = _FALLBACK.get(name, next(iter(table.values()))[0])
+            print(f"Error: cache codec '{name}' in '{spec}' is not available, using '{fallback}'")
+            name = fallback
+
+    def encode(self, value: Any) -> bytes:
+        payload = _SERIALIZERS[self.ser_id][1](value)
+        if self.legacy:
+            return payload
+        comp_id = self.comp_id if len(payload) >= COMPRESS_MIN_BYTES else b"-"
+        return HEADER + VERSION + self.ser_id + comp_id + _COMPRESSORS[comp_id][1](payload)
+
+
+def decode(raw: Optional[bytes]) -> Optional[Any]:
+    """Decode any supported format; None for missing or undecodable entries."""
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        raw = raw.encode()
+    if raw[:2] != HEADER:
+        # headerless legacy JSON text
+        try:
+            return json.loads(raw)
+        except Exception:
+            return raw.decode(errors="replace")
+    if raw[2:3] != VERSION:
+        return None  # written by a newer release; treat as a miss
+    try:
+        payload = _COMPRESSORS[raw[4:5]][2](raw[5:])
+        return _SERIALIZERS[raw[3:4]][2](payload)
+    except Exception:
+        return None
+
+
+def project(value: Any, fields: list[str]) -> Any:
+    """Keep only ``fields`` of a dict; dotted paths ("hourly.time") reach one level down."""
+    if not fields or not isinstance(value, dict):
+        return value
+    out: dict = {}
+    for field in fields:
+        top, _, sub = field.partition(".")
+        if top not in value:
+            continue
+        if sub and isinstance(value[top], dict):
+            if sub in value[top]:
+                out.setdefault(top, {})[sub] = value[top][sub]
+        else:
+            out[top] = value[top]
+    return out
+
+
+codec = Codec(os.getenv("CACHE_CODEC", "json"))
+
+
+def benchmark(samples: list[Any], specs: Optional[list[str]] = None, rounds: int = 200) -> list[dict]:
+    """Bytes per key and mean encode/decode time for each codec over ``samples``."""
+    if specs is None:
+        specs = [f"{s}+{c}" if c != "none" else s for s, *_ in _SERIALIZERS.values() for c, *_ in _COMPRESSORS.values()]
+    rows = []
+    for spec in specs:
+        c = Codec(spec)
+        encoded = [c.encode(sample) for sample in samples]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for sample in samples:
+                c.encode(sample)
+        encode_us = (time.perf_counter() - start) / (rounds * len(samples)) * 1e6
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for raw in encoded:
+                decode(raw)
+        decode_us = (time.perf_counter() - start) / (rounds * len(samples)) * 1e6
+        rows.append({
+            "codec": c.name,
+            "bytes_per_key": round(sum(map(len, encoded)) / len(encoded)),
+            "encode_us": round(encode_us, 1),
+            "decode_us": round(decode_us, 1),
+        })
+    return rows
+
+
+def _synthetic_weather() -> dict:
+    """An Open-Meteo-shaped payload: 7 days of hourly data for one point."""
+    hours = [f"2025-01-{1 + h // 24:02d}T{h % 24:02d}:00" for h in range(168)]
+    return {
+        "latitude": 31.625, "longitude": -7.9875, "generationtime_ms": 0.07, "utc_offset_seconds": 3600,
+        "timezone": "Africa/Casablanca", "timezone_abbreviation": "+01", "elevation": 466.0,
+        "current_weather": {"temperature": 18.4, "windspeed": 7.2, "winddirection": 250, "weathercode": 1, "time": hours[12]},
+        "hourly_units": {"time": "iso8601", "temperature_2m": "°C", "precipitation": "mm", "wind_speed_10m": "km/h"},
+        "hourly": {
+            "time": hours,
+            "temperature_2m": [round(12 + 8 * ((h % 24) / 24), 1) for h in range(168)],
+            "precipitation": [0.0 if h % 17 else 0.3 for h in range(168)],
+            "wind_speed_10m": [round(5 + (h * 7) % 13 * 0.9, 1) for h in range(168)],
+        },
+        "daily_units": {"time": "iso8601", "temperature_2m_max": "°C"},
+        "daily": {
+            "time": [d[:10] for d in hours[::24]],
+            "temperature_2m_max": [21.3, 22.0, 19.8, 20.4, 23.1, 24.0, 22.7],
+            "temperature_2m_min": [9.1, 10.2, 8.7, 9.9, 11.0, 12.4, 11.8],
+            "precipitation_sum": [0.0, 0.0, 1.2, 0.3, 0.0, 0.0, 0.0],
+        },
+    }
+
+
+if __name__ == "__main__":
+    samples = [json.load(open(path)) for path in sys.argv[1:]] or [_synthetic_weather()]
+    print(f"{'codec':<16}{'bytes/key':>10}{'encode us':>11}{'decode us':>11}")
+    for row in benchmark(samples):
+        print(f"{row['codec']:<16}{row['bytes_per_key']:>10}{row['encode_us']:>11}{row['decode_us']:>11}")
@@ -1,37 +1,262 @@
 import os
-import json
+import time
+from collections import OrderedDict
 from typing import Any, Optional
-import redis
+import redis.asyncio as redis
 
-def get_client() -> redis.Redis:
-    host = os.getenv("REDIS_HOST", "redis")
-    port = int(os.getenv("REDIS_PORT", "6379"))
+from .codec import codec, decode
+
+# After a failed call, skip Redis entirely for this many seconds instead of
+# paying the connect timeout on every request while it is down.
+BACKOFF_SEC = float(os.getenv("REDIS_BACKOFF_SEC", "5"))
+
+# In-process L1 tier in front of Redis
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(32 * 1024 * 1024)))
+L1_MAX_TTL = float(os.getenv("CACHE_L1_MAX_TTL", "300"))
+
+
+class LocalCache:
+    """Byte-bounded LRU with per-entry expiry, used as the L1 cache tier.
+
+    Entries hold the decoded value, so a hit skips both the Redis round trip
+    and decoding. Values are shared between callers and must not be
+    mutated. Sizes are the length of the stored encoding, which is a cheap
+    and stable proxy for memory use.
+    """
+
+    def __init__(self, max_bytes: int = L1_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, size = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_sec: float, size: int) -> None:
+        if ttl_sec <= 0 or size > self.max_bytes:
+            self._drop(key)
+            return
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl_sec, value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+def get_client() -> Optional[redis.Redis]:
+    url = os.getenv("REDIS_URL")
     try:
-        return redis.Redis(host=host, port=port, decode_responses=True)
+        if url:
+            pool = redis.ConnectionPool.from_url(
+                url,
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.25")),
+                socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+                decode_responses=False,
+            )
+        else:
+            pool = redis.ConnectionPool(
+                host=os.getenv("REDIS_HOST", "redis"),
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.25")),
+                socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+                decode_responses=False,
+            )
+        return redis.Redis(connection_pool=pool)
     except Exception:
         # Return None if Redis is not available
         return None
 
 r = get_client()
+l1 = LocalCache()
+_down_until = 0.0
+l2_hits = 0
+l2_misses = 0
+
+def _available() -> bool:
+    return r is not None and time.monotonic() >= _down_until
+
+def _mark_down() -> None:
+    global _down_until
+    _down_until = time.monotonic() + BACKOFF_SEC
+
+def _l1_ttl(pttl_ms: Optional[int]) -> float:
+    """L1 lifetime for a value read from Redis: never outlives the L2 entry."""
+    if pttl_ms is None or pttl_ms < 0:
+        return L1_MAX_TTL if pttl_ms == -1 else 0
+    return min(L1_MAX_TTL, pttl_ms / 1000)
+
+async def cache_get(key: str) -> Optional[Any]:
+    return (await cache_mget([key]))[0]
+
+async def cache_mget(keys: list[str]) -> list[Optional[Any]]:
+    """Fetch several keys, L1 first, then one Redis round trip for the rest.
+
+    Missing keys come back as None. Values found in Redis are copied into L1
+    with their remaining Redis TTL (capped at ``CACHE_L1_MAX_TTL``).
+    """
+    global l2_hits, l2_misses
+    results: list[Optional[Any]] = [l1.get(key) for key in keys]
+    missing = [i for i, v in enumerate(results) if v is None]
+    if not missing or not _available():
+        return results
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            for i in missing:
+                pipe.get(keys[i])
+                pipe.pttl(keys[i])
+            replies = await pipe.execute()
+    except Exception:
+        _mark_down()
+        return results
+    for n, i in enumerate(missing):
+        raw, pttl = replies[2 * n], replies[2 * n + 1]
+        if raw is None:
+            l2_misses += 1
+            continue
+        value = decode(raw)
+        if value is None:
+            l2_misses += 1  # unknown format version
+            continue
+        l2_hits += 1
+        results[i] = value
+        l1.set(keys[i], value, _l1_ttl(pttl), len(raw))
+    return results
 
-def cache_get(key: str) -> Optional[Any]:
-    if r is None:
+async def cache_set(key: str, value: Any, ttl_sec: int) -> None:
+    await cache_set_many({key: value}, ttl_sec)
+
+async def cache_set_many(items: dict[str, Any], ttl_sec: int) -> None:
+    """Write several keys with the same TTL to L1 and, pipelined, to Redis."""
+    if not items:
+        return
+    encoded = {key: codec.encode(value) for key, value in items.items()}
+    for key, value in items.items():
+        l1.set(key, value, min(L1_MAX_TTL, ttl_sec), len(encoded[key]))
+    if not _available():
+        return
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            for key, raw in encoded.items():
+                pipe.set(key, raw, ex=ttl_sec)
+            await pipe.execute()
+    except Exception:
+        _mark_down()
+
+async def try_lock(key: str, ttl_ms: int) -> Optional[str]:
+    """Take a short-lived Redis lock; returns a token, or None if held elsewhere.
+
+    When Redis is unavailable every caller gets a token, i.e. locking degrades
+    to "no coordination" rather than blocking.
+    """
+    token = os.urandom(8).hex()
+    if not _available():
+        return token
+    try:
+        acquired = await r.set(f"lock:{key}", token, nx=True, px=ttl_ms)
+    except Exception:
+        _mark_down()
+        return token
+    return token if acquired else None
+
+async def counter_get(key: str) -> Optional[int]:
+    """Current value of an INCR counter (0 if unset), or None without Redis."""
+    if not _available():
         return None
     try:
-        v = r.get(key)
-        if v is None:
-            return None
-        try:
-            return json.loads(v)
-        except Exception:
-            return v
+        raw = await r.get(key)
+    except Exception:
+        _mark_down()
+        return None
+    return int(raw) if raw is not None else 0
+
+async def counter_incr(key: str) -> Optional[int]:
+    """Increment a counter shared by all workers; None without Redis."""
+    if not _available():
+        return None
+    try:
+        return await r.incr(key)
     except Exception:
+        _mark_down()
         return None
 
-def cache_set(key: str, value: Any, ttl_sec: int) -> None:
-    if r is None:
+# compare-and-delete in one step: the lock may have expired and been
+# retaken by another worker between a separate GET and DEL
+_UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+async def unlock(key: str, token: str) -> None:
+    """Release a lock taken by ``try_lock``, but only if ``token`` still holds it."""
+    if not _available():
         return
     try:
-        r.set(key, json.dumps(value), ex=ttl_sec)
+        await r.eval(_UNLOCK_SCRIPT, 1, f"lock:{key}", token)
     except Exception:
-        pass
\ No newline at end of file
+        _mark_down()
+
+def metrics() -> dict:
+    l2_lookups = l2_hits + l2_misses
+    return {
+        "codec": codec.name,
+        "l1": l1.stats(),
+        "l2": {
+            "hits": l2_hits,
+            "misses": l2_misses,
+            "hit_ratio": round(l2_hits / l2_lookups, 4) if l2_lookups else None,
+            "available": _available(),
+        },
+    }
+
+async def close() -> None:
+    if r is not None:
+        try:
+            await r.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+# A provider's breaker opens after this many consecutive failures and stays
+# open for BREAKER_COOLDOWN_SEC, then lets a single trial call through.
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SEC = float(os.getenv("BREAKER_COOLDOWN_SEC", "30"))
+
+# A hedged call goes to the next provider once the current one has taken
+# longer than its p95 latency, clamped to [HEDGE_MIN_MS, HEDGE_MAX_MS].
+# Until a provider has LATENCY_MIN_SAMPLES timings HEDGE_DEFAULT_MS is used.
+HEDGE_MIN_MS = float(os.getenv("HEDGE_MIN_MS", "50"))
+HEDGE_MAX_MS = float(os.getenv("HEDGE_MAX_MS", "2000"))
+HEDGE_DEFAULT_MS = float(os.getenv("HEDGE_DEFAULT_MS", "500"))
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+SUCCESS_EWMA_ALPHA = 0.1
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class ProviderHealth:
+    """Circuit breaker plus recent latency and success rate for one provider."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.success_rate = 1.0
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < BREAKER_COOLDOWN_SEC:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; half-open admits one trial at a time."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def success(self, elapsed_ms: float) -> None:
+        self.calls += 1
+        self.latencies.append(elapsed_ms)
+        self.success_rate += SUCCESS_EWMA_ALPHA * (1.0 - self.success_rate)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self) -> None:
+        self.calls += 1
+        self.errors += 1
+        self.success_rate -= SUCCESS_EWMA_ALPHA * self.success_rate
+        self.failures += 1
+        self.probing = False
+        if self.failures >= BREAKER_FAILURES or self.opened_at is not None:
+            # a failed trial call re-opens for another full cooldown
+            self.opened_at = time.monotonic()
+
+    def abandon(self, elapsed_ms: float) -> None:
+        """The call was cancelled (lost a hedge race) without an outcome.
+
+        Its elapsed time is a lower bound on the latency, kept so a provider
+        that keeps losing races sees its p95 and score reflect it.
+        """
+        self.latencies.append(elapsed_ms)
+        self.probing = False
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self.latencies) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95_ms()
+        delay = HEDGE_DEFAULT_MS if p95 is None else p95
+        return min(HEDGE_MAX_MS, max(HEDGE_MIN_MS, delay)) / 1000
+
+    def score(self) -> float:
+        """0..1, higher is better: recent success rate discounted by p95 latency."""
+        p95 = self.p95_ms() or 0.0
+        return self.success_rate * 1000 / (1000 + p95)
+
+    def as_dict(self) -> dict:
+        p95 = self.p95_ms()
+        return {
+            "state": self.state,
+            "score": round(self.score(), 4),
+            "p95_ms": round(p95, 2) if p95 is not None else None,
+            "success_rate": round(self.success_rate, 4),
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
+
+
+def _is_failure(e: Exception) -> bool:
+    # a 4xx is the provider answering (e.g. unknown currency), not being down
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return True
+
+
+Attempt = tuple[str, Callable[[], Awaitable[Optional[Any]]]]
+
+
+class ProviderRouter:
+    """Routes upstream calls by provider health.
+
+    ``call`` guards a single provider with its circuit breaker. ``hedged``
+    races a list of interchangeable providers: the healthiest goes first,
+    the next is started when the current one fails or runs past its p95
+    latency, and the first non-None answer wins while the rest are
+    cancelled.
+    """
+
+    def __init__(self):
+        self._health: dict[str, ProviderHealth] = {}
+        self.hedges = 0
+        self.wins: dict[str, int] = {}
+
+    def health(self, provider: str) -> ProviderHealth:
+        health = self._health.get(provider)
+        if health is None:
+            health = self._health[provider] = ProviderHealth()
+        return health
+
+    async def _attempt(self, provider: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        health = self.health(provider)
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            health.abandon((time.perf_counter() - start) * 1000)
+            raise
+        except Exception as e:
+            if _is_failure(e):
+                health.failure()
+            else:
+                health.success((time.perf_counter() - start) * 1000)
+            raise
+        health.success((time.perf_counter() - start) * 1000)
+        return result
+
+    async def call(self, provider: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` unless ``provider``'s circuit is open, recording the outcome."""
+        if not self.health(provider).allow():
+            raise ProviderUnavailable(f"{provider} circuit open")
+        return await self._attempt(provider, fn)
+
+    def order(self, providers: list[str]) -> list[str]:
+        """Closed circuits first, then by health score; ties keep configured order."""
+        rank = {"closed": 0, "half_open": 1, "open": 2}
+        return sorted(providers, key=lambda p: (rank[self.health(p).state], -round(self.health(p).score(), 2)))
+
+    async def hedged(self, attempts: list[Attempt]) -> Optional[Any]:
+        """First non-None result across ``attempts`` [(provider, fn)], or None."""
+        fns = dict(attempts)
+        queue = iter(self.order(list(fns)))
+        pending: dict[asyncio.Task, str] = {}
+
+        def launch_next() -> Optional[float]:
+            for provider in queue:
+                if self.health(provider).allow():
+                    task = asyncio.ensure_future(self._attempt(provider, fns[provider]))
+                    pending[task] = provider
+                    return self.health(provider).hedge_delay()
+            return None
+
+        delay = launch_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # slow past its p95: hedge to the next provider, keep waiting on both
+                    next_delay = launch_next()
+                    if next_delay is not None:
+                        self.hedges += 1
+                    delay = next_delay
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None and task.result() is not None:
+                        self.wins[provider] = self.wins.get(provider, 0) + 1
+                        return task.result()
+                # failed or empty answer: move on right away
+                delay = launch_next()
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # finished alongside the winner; mark retrieved
+        return None
+
+    def metrics(self) -> dict:
+        return {
+            "providers": {provider: health.as_dict() for provider, health in self._health.items()},
+            "hedges": self.hedges,
+            "wins": dict(self.wins),
+        }
+
+
+providers = ProviderRouter()
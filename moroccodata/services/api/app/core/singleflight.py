@@ -0,0 +1,312 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from . import redis as cache
+
+# Cross-worker coordination: one worker takes a Redis lock and fetches, the
+# others poll the cache for up to LOCK_WAIT_SEC before fetching themselves.
+REDIS_LOCK = os.getenv("SINGLEFLIGHT_REDIS_LOCK", "true").lower() == "true"
+LOCK_TTL_MS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_MS", "10000"))
+LOCK_WAIT_SEC = float(os.getenv("SINGLEFLIGHT_LOCK_WAIT_SEC", "2"))
+LOCK_POLL_SEC = 0.05
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key starts ``fn``; callers arriving while it is in
+    flight await the same result (or exception). Nothing is remembered once
+    the call finishes.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._batches: set[asyncio.Task] = set()
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # run as a task so a cancelled caller doesn't cancel the shared work
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def do_many(
+        self, keys: list[str], fn: Callable[[list[str]], Awaitable[dict]]
+    ) -> dict[str, asyncio.Future]:
+        """Batch form of ``do``: one future per key, to be awaited by the caller.
+
+        Keys already in flight (from ``do`` or another batch) join that call.
+        The rest are claimed together and fetched by a single ``fn(new_keys)``,
+        whose ``{key: result}`` dict is split into the per-key futures (a key
+        it leaves out resolves to None), so later ``do`` callers for any of
+        them wait for the batch instead of starting their own call.
+        """
+        futures: dict[str, asyncio.Future] = {}
+        new: list[str] = []
+        for key in keys:
+            task = self._inflight.get(key)
+            if task is None:
+                new.append(key)
+            else:
+                self.shared += 1
+                futures[key] = task
+        if not new:
+            return futures
+
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        claimed = {key: loop.create_future() for key in new}
+        for key, future in claimed.items():
+            self._inflight[key] = future
+            future.add_done_callback(lambda f, key=key: self._done(key, f))
+        futures.update(claimed)
+
+        def split(batch: asyncio.Future) -> None:
+            error = None if batch.cancelled() else batch.exception()
+            for key, future in claimed.items():
+                if future.done():
+                    continue
+                if batch.cancelled():
+                    future.cancel()
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(batch.result().get(key))
+
+        batch = asyncio.ensure_future(fn(new))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+        batch.add_done_callback(split)
+        return futures
+
+    def _done(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark retrieved so an exception nobody awaited isn't logged
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
+
+
+flight = SingleFlight()
+
+# per key-prefix ("wx", "fx", ...) counts of fresh hits, stale hits and misses
+_hit_stats: dict[str, dict[str, int]] = {}
+
+
+def _record(key: str, outcome: str) -> None:
+    stats = _hit_stats.setdefault(key.split(":", 1)[0], {"hits": 0, "stale": 0, "misses": 0})
+    stats[outcome] += 1
+
+
+def hit_stats() -> dict:
+    """Hit ratios per key prefix; stale-but-served counts as a hit."""
+    out = {}
+    for prefix, s in _hit_stats.items():
+        total = s["hits"] + s["stale"] + s["misses"]
+        out[prefix] = {**s, "hit_ratio": round((s["hits"] + s["stale"]) / total, 4) if total else None}
+    return out
+
+
+class Fetched(NamedTuple):
+    value: Optional[Any]
+    cached: bool
+    age_sec: Optional[float]
+    stale: bool
+
+
+def _wrap(value: Any) -> dict:
+    return {"_swr": 1, "at": time.time(), "v": value}
+
+
+def _unwrap(entry: Any, soft_ttl: int) -> tuple[Any, float]:
+    """Split a cache entry into (value, fetched_at).
+
+    Entries written before soft/hard TTLs existed carry no timestamp; they
+    are treated as just past the soft TTL so they get refreshed soon.
+    """
+    if isinstance(entry, dict) and entry.get("_swr") == 1:
+        return entry["v"], entry["at"]
+    return entry, time.time() - soft_ttl
+
+
+async def _fetch_and_store(
+    key: str, store_ttl: int, fetch: Callable[[], Awaitable[Optional[Any]]]
+) -> Optional[dict]:
+    token = await cache.try_lock(key, LOCK_TTL_MS) if REDIS_LOCK else None
+    if REDIS_LOCK and token is None:
+        # another worker is fetching; give it a moment to fill the cache
+        started = time.time()
+        deadline = asyncio.get_running_loop().time() + LOCK_WAIT_SEC
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(LOCK_POLL_SEC)
+            cache.l1.delete(key)  # look past our own L1 copy
+            entry = await cache.cache_get(key)
+            if isinstance(entry, dict) and entry.get("at", 0) >= started - LOCK_TTL_MS / 1000:
+                return entry
+    try:
+        value = await fetch()
+        if value is None:
+            return None
+        entry = _wrap(value)
+        await cache.cache_set(key, entry, ttl_sec=store_ttl)
+        return entry
+    finally:
+        if token is not None:
+            await cache.unlock(key, token)
+
+
+_background: set[asyncio.Task] = set()
+
+
+def _refresh_in_background(key: str, store_ttl: int, fetch: Callable[[], Awaitable[Optional[Any]]]) -> None:
+    async def refresh():
+        try:
+            await flight.do(key, lambda: _fetch_and_store(key, store_ttl, fetch))
+        except Exception:
+            pass  # keep serving the stale copy; the next request will retry
+
+    task = asyncio.ensure_future(refresh())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def cached_fetch(
+    key: str,
+    fetch: Callable[[], Awaitable[Optional[Any]]],
+    soft_ttl: int,
+    hard_ttl: int,
+    stale_ttl: Optional[int] = None,
+) -> Fetched:
+    """Stale-while-revalidate read of ``key``, fetching at most once per miss.
+
+    - younger than ``soft_ttl``: served from cache;
+    - between ``soft_ttl`` and ``hard_ttl``: served from cache while a
+      background task refreshes it;
+    - older than ``hard_ttl`` or missing: fetched synchronously.
+
+    If a synchronous fetch fails or returns None, a cached copy younger than
+    ``stale_ttl`` (default ``2 * hard_ttl``, also the Redis expiry) is
+    served instead, so upstream errors only surface when there is nothing
+    to fall back on.
+
+    ``fetch`` returns the value to cache, None for "nothing to cache", or
+    raises; concurrent misses in this process share one call, and across
+    workers the optional Redis lock lets a single worker go upstream.
+    """
+    store_ttl = stale_ttl or 2 * hard_ttl
+    entry = await cache.cache_get(key)
+    if entry is not None:
+        value, fetched_at = _unwrap(entry, soft_ttl)
+        age = max(0.0, time.time() - fetched_at)
+        if age < soft_ttl:
+            _record(key, "hits")
+            return Fetched(value, True, age, False)
+        if age < hard_ttl:
+            _record(key, "stale")
+            _refresh_in_background(key, store_ttl, fetch)
+            return Fetched(value, True, age, True)
+
+    _record(key, "misses")
+    try:
+        fresh = await flight.do(key, lambda: _fetch_and_store(key, store_ttl, fetch))
+    except Exception:
+        if entry is None:
+            raise
+        fresh = None
+    if fresh is None:
+        if entry is not None:
+            return Fetched(value, True, age, True)
+        return Fetched(None, False, None, False)
+    return Fetched(fresh["v"], False, max(0.0, time.time() - fresh["at"]), False)
+
+
+async def _fetch_and_store_many(
+    keys: list[str], store_ttl: int, fetch_many: Callable[[list[str]], Awaitable[dict]]
+) -> dict:
+    values = await fetch_many(keys)
+    entries = {key: _wrap(value) for key, value in values.items() if value is not None}
+    await cache.cache_set_many(entries, ttl_sec=store_ttl)
+    return entries
+
+
+async def cached_fetch_many(
+    keys: list[str],
+    fetch_many: Callable[[list[str]], Awaitable[dict]],
+    soft_ttl: int,
+    hard_ttl: int,
+    stale_ttl: Optional[int] = None,
+    record: bool = True,
+) -> dict[str, Fetched]:
+    """Batch form of ``cached_fetch`` with the same TTL semantics.
+
+    Cached keys are read in one multi-get; everything missing or past the
+    hard TTL that no other request is already fetching is handed to a
+    single ``fetch_many(missing_keys)`` call, which returns ``{key: value}``
+    for whatever it could get, and the results are written back in one
+    pipelined batch. Keys already being fetched (by ``cached_fetch`` or
+    another batch) are awaited instead. Keys past the soft TTL are
+    refreshed together in the background. Keys that could be neither
+    served nor fetched are absent from the result. With ``record=False``
+    (e.g. for cache prewarming) the lookups are left out of ``hit_stats``.
+    """
+    store_ttl = stale_ttl or 2 * hard_ttl
+    keys = list(dict.fromkeys(keys))
+    note = _record if record else (lambda key, outcome: None)
+    results: dict[str, Fetched] = {}
+    missing: list[str] = []
+    refresh: list[str] = []
+    now = time.time()
+
+    for key, entry in zip(keys, await cache.cache_mget(keys)):
+        if entry is None:
+            note(key, "misses")
+            missing.append(key)
+            continue
+        value, fetched_at = _unwrap(entry, soft_ttl)
+        age = max(0.0, now - fetched_at)
+        results[key] = Fetched(value, True, age, age >= soft_ttl)
+        if age >= hard_ttl:
+            note(key, "misses")
+            missing.append(key)
+        elif age >= soft_ttl:
+            note(key, "stale")
+            refresh.append(key)
+        else:
+            note(key, "hits")
+
+    def fetch_batch(batch: list[str]) -> Awaitable[dict]:
+        return _fetch_and_store_many(batch, store_ttl, fetch_many)
+
+    if refresh:
+        # registered with the single-flight map, like misses, so concurrent
+        # refreshes of the same keys (batched or not) share one call
+        futures = flight.do_many(refresh, fetch_batch)
+
+        async def refresh_batch():
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+
+        task = asyncio.ensure_future(refresh_batch())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+    if missing:
+        # keys another request is already fetching are awaited, not refetched
+        futures = flight.do_many(missing, fetch_batch)
+        fresh = await asyncio.gather(*(asyncio.shield(f) for f in futures.values()), return_exceptions=True)
+        for key, entry in zip(futures, fresh):
+            if isinstance(entry, dict):
+                results[key] = Fetched(entry["v"], False, max(0.0, time.time() - entry["at"]), False)
+
+    return results
@@ -0,0 +1,75 @@
+import os
+from typing import List, Optional
+
+from .core.http import upstream
+from .core.routing import providers
+
+# Comma-separated provider priority list. The first healthy provider is asked
+# first and the next one is hedged in when it is slow; a single name disables
+# hedging. Unknown names are ignored.
+FX_PROVIDER = os.getenv("FX_PROVIDER", "er-api,fawazahmed0")
+# Rate table every pair is derived from when possible (one upstream call per refresh)
+FX_ANCHOR = os.getenv("FX_ANCHOR", "USD").upper()
+
+FX_URLS = {
+    "er-api": lambda base: f"https://open.er-api.com/v6/latest/{base}",
+    "fawazahmed0": lambda base: f"https://cdn.jsdelivr.net/gh/fawazahmed0/currency-api@1/latest/currencies/{base.lower()}.json",
+    "exchangerate_host": lambda base: f"https://api.exchangerate.host/latest?base={base}",
+    "frankfurter": lambda base: f"https://api.frankfurter.app/latest?from={base}",
+}
+FX_DEFAULT_PROVIDERS = ["er-api", "fawazahmed0"]
+
+
+def fx_provider_names() -> List[str]:
+    names = [name.strip() for name in FX_PROVIDER.split(",") if name.strip() in FX_URLS]
+    return list(dict.fromkeys(names)) or FX_DEFAULT_PROVIDERS
+
+
+def fx_providers(base: str) -> List[tuple[str, str]]:
+    return [(name, FX_URLS[name](base)) for name in fx_provider_names()]
+
+
+def parse_fx_table(provider_name: str, base: str, j: dict) -> Optional[dict]:
+    """Normalize a provider response into {base, date, provider, rates}."""
+    if provider_name == "er-api":
+        if j.get("result") == "success" and j.get("rates"):
+            return {"base": j["base_code"], "date": j.get("time_last_update_utc"), "provider": provider_name, "rates": j["rates"]}
+    elif provider_name == "fawazahmed0":
+        rates = j.get(base.lower())
+        if rates:
+            return {
+                "base": base,
+                "date": j.get("date"),
+                "provider": provider_name,
+                "rates": {code.upper(): rate for code, rate in rates.items()},
+            }
+    elif j.get("rates"):
+        # exchangerate_host / frankfurter
+        return {"base": j.get("base", base), "date": j.get("date"), "provider": provider_name, "rates": {**j["rates"], base: 1}}
+    return None
+
+
+async def _fetch_table(provider_name: str, url: str, base: str) -> Optional[dict]:
+    r = await upstream.get(provider_name, url)
+    r.raise_for_status()
+    return parse_fx_table(provider_name, base, r.json())
+
+
+async def fetch_fx_table(base: str) -> Optional[dict]:
+    """Fetch the full rate table for ``base`` from the configured providers, hedged."""
+    return await providers.hedged([
+        (provider_name, lambda p=provider_name, u=url: _fetch_table(p, u, base))
+        for provider_name, url in fx_providers(base)
+    ])
+
+
+def cross_rate(table: dict, base: str, quote: str) -> Optional[float]:
+    """base->quote from a table quoted in another currency (triangulation)."""
+    rates = table["rates"]
+    b = 1.0 if base == table["base"] else rates.get(base)
+    q = 1.0 if quote == table["base"] else rates.get(quote)
+    if not b or q is None:
+        return None
+    if base == table["base"]:
+        return q
+    return round(q / b, 8)
@@ -0,0 +1,135 @@
+"""Scheduled FX history capture.
+
+Records a configured set of currency pairs into ``fx_rates`` on an interval:
+one upstream fetch per distinct base, all rows written in a single
+``executemany`` INSERT followed by one hourly/daily rollup refresh. Runs
+inside the API (``FX_RECORD_ENABLED=true``) or standalone::
+
+    python -m app.fx_recorder          # loop forever
+    python -m app.fx_recorder --once   # record one cycle and exit
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import List, Optional
+
+from .core.db import SessionLocal
+from .core import redis as cache
+from .fx import fetch_fx_table, cross_rate
+from .fx_rollups import insert_rates
+
+FX_RECORD_ENABLED = os.getenv("FX_RECORD_ENABLED", "false").lower() == "true"
+FX_RECORD_PAIRS = os.getenv("FX_RECORD_PAIRS", "USD:MAD,EUR:MAD,GBP:MAD")
+FX_RECORD_INTERVAL = int(os.getenv("FX_RECORD_INTERVAL", "3600"))
+FX_RECORD_JITTER = int(os.getenv("FX_RECORD_JITTER", "60"))
+
+# Held while a cycle runs; across workers the Redis lock stops duplicate rows
+LOCK_KEY = "fx:recorder"
+
+_running = asyncio.Lock()
+stats = {
+    "cycles": 0,
+    "skipped": 0,
+    "errors": 0,
+    "last_rows": 0,
+    "last_duration_ms": None,
+    "last_finished_at": None,
+}
+
+
+def parse_pairs(spec: str) -> List[tuple[str, str]]:
+    """Parse 'USD:MAD,EUR:MAD' into [('USD', 'MAD'), ('EUR', 'MAD')]."""
+    pairs = []
+    for item in spec.split(","):
+        if ":" not in item:
+            continue
+        base, quote = item.split(":", 1)
+        if base.strip() and quote.strip():
+            pairs.append((base.strip().upper(), quote.strip().upper()))
+    return list(dict.fromkeys(pairs))
+
+
+async def record_pairs(pairs: List[tuple[str, str]]) -> dict:
+    """Fetch each distinct base once and insert every pair's rate in one batch."""
+    quotes_by_base: dict[str, list] = {}
+    for base, quote in pairs:
+        quotes_by_base.setdefault(base, []).append(quote)
+
+    tables = await asyncio.gather(*(fetch_fx_table(base) for base in quotes_by_base))
+
+    rows = []
+    missing = []
+    for (base, quotes), table in zip(quotes_by_base.items(), tables):
+        for quote in quotes:
+            rate = cross_rate(table, base, quote) if table else None
+            if rate is None:
+                missing.append(f"{base}/{quote}")
+                continue
+            rows.append({"base": base, "quote": quote, "rate": float(rate), "provider": table["provider"]})
+
+    if rows:
+        async with SessionLocal() as s:
+            await insert_rates(s, rows)
+            await s.commit()
+    return {"rows": rows, "missing": missing}
+
+
+async def run_cycle(pairs: Optional[List[tuple[str, str]]] = None) -> Optional[dict]:
+    """Record one cycle unless another is already running here or in another worker."""
+    if _running.locked():
+        stats["skipped"] += 1
+        return None
+    async with _running:
+        token = await cache.try_lock(LOCK_KEY, FX_RECORD_INTERVAL * 1000 // 2)
+        if token is None:
+            stats["skipped"] += 1
+            return None
+        start = time.perf_counter()
+        try:
+            result = await record_pairs(pairs or parse_pairs(FX_RECORD_PAIRS))
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"FX record cycle failed: {e}")
+            return None
+        finally:
+            # the lock deliberately outlives the cycle so other workers skip this interval
+            stats["last_duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        stats["cycles"] += 1
+        stats["last_rows"] = len(result["rows"])
+        stats["last_finished_at"] = time.time()
+        return result
+
+
+async def record_loop() -> None:
+    """Run a cycle every FX_RECORD_INTERVAL seconds, plus up to FX_RECORD_JITTER of jitter."""
+    while True:
+        await asyncio.sleep(random.uniform(0, FX_RECORD_JITTER))
+        await run_cycle()
+        await asyncio.sleep(FX_RECORD_INTERVAL)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record FX rates into fx_rates.")
+    parser.add_argument("--once", action="store_true", help="record a single cycle and exit")
+    parser.add_argument("--pairs", default=FX_RECORD_PAIRS, help="pairs as 'USD:MAD,EUR:MAD'")
+    args = parser.parse_args()
+
+    async def run():
+        pairs = parse_pairs(args.pairs)
+        if args.once:
+            result = await run_cycle(pairs)
+            print(f"Recorded {len(result['rows']) if result else 0} rates in {stats['last_duration_ms']} ms")
+            if result and result["missing"]:
+                print(f"Missing: {', '.join(result['missing'])}")
+        else:
+            while True:
+                await run_cycle(pairs)
+                await asyncio.sleep(FX_RECORD_INTERVAL + random.uniform(0, FX_RECORD_JITTER))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
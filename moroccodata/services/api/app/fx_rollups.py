@@ -0,0 +1,117 @@
+"""Hourly and daily OHLC rollups of ``fx_rates``.
+
+Rows are written through ``insert_rates``, which refreshes the touched
+hour and day buckets in the same transaction: hourly buckets are
+re-aggregated from the raw rows of that hour, daily buckets from their
+hourly buckets, so each refresh reads at most an hour of captures plus 24
+hourly rows per pair. Buckets are UTC.
+
+A refresh recomputes whole buckets, so two transactions refreshing the
+same pair at once could each write a bucket computed without the other's
+uncommitted captures, and the last to commit would win. Each refresh
+therefore takes a transaction-level advisory lock per pair first; the
+waiting transaction's recompute then runs after the other commits and,
+under READ COMMITTED, sees its rows. The SQL here is Postgres-only
+(advisory locks, date_trunc, array_agg) and is not exercised by the
+SQLite test suite.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Interval name -> rollup table; "raw" reads fx_rates directly
+ROLLUP_TABLES = {"hour": "fx_rates_hourly", "day": "fx_rates_daily"}
+
+_INSERT_RATE = text("""
+    INSERT INTO fx_rates (base, quote, rate, provider)
+    VALUES (:base, :quote, :rate, :provider)
+""")
+
+# Held until commit or rollback; taken in sorted pair order so concurrent refreshes cannot deadlock
+_LOCK_PAIR = text("SELECT pg_advisory_xact_lock(hashtext(:base || '/' || :quote))")
+
+# :since NULL means "this transaction", i.e. rows just inserted with captured_at = NOW()
+_REFRESH_HOURLY = text("""
+    INSERT INTO fx_rates_hourly (base, quote, bucket, open, high, low, close, mean, samples)
+    SELECT base, quote, bucket,
+           (array_agg(rate ORDER BY captured_at))[1],
+           MAX(rate), MIN(rate),
+           (array_agg(rate ORDER BY captured_at DESC))[1],
+           AVG(rate), COUNT(*)
+    FROM (
+        SELECT base, quote, rate, captured_at,
+               date_trunc('hour', captured_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket
+        FROM fx_rates
+        WHERE base = :base AND quote = :quote
+          AND captured_at >= date_trunc('hour', COALESCE(CAST(:since AS timestamptz), NOW()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    ) r
+    GROUP BY base, quote, bucket
+    ON CONFLICT (base, quote, bucket) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+        close = EXCLUDED.close, mean = EXCLUDED.mean, samples = EXCLUDED.samples
+""")
+
+_REFRESH_DAILY = text("""
+    INSERT INTO fx_rates_daily (base, quote, bucket, open, high, low, close, mean, samples)
+    SELECT base, quote, bucket,
+           (array_agg(open ORDER BY hour))[1],
+           MAX(high), MIN(low),
+           (array_agg(close ORDER BY hour DESC))[1],
+           SUM(mean * samples) / SUM(samples), SUM(samples)
+    FROM (
+        SELECT base, quote, open, high, low, close, mean, samples, bucket AS hour,
+               date_trunc('day', bucket AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket
+        FROM fx_rates_hourly
+        WHERE base = :base AND quote = :quote
+          AND bucket >= date_trunc('day', COALESCE(CAST(:since AS timestamptz), NOW()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    ) h
+    GROUP BY base, quote, bucket
+    ON CONFLICT (base, quote, bucket) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+        close = EXCLUDED.close, mean = EXCLUDED.mean, samples = EXCLUDED.samples
+""")
+
+
+async def refresh_rollups(
+    s: AsyncSession, pairs: Iterable[tuple[str, str]], since: Optional[datetime] = None
+) -> None:
+    """Recompute the hour and day buckets of ``pairs`` from ``since`` on.
+
+    Without ``since`` only the current buckets are refreshed, which covers
+    rows inserted in the current transaction. Pass an earlier time after
+    backfilling older captures. Blocks while another transaction is
+    refreshing any of the same pairs.
+    """
+    params = [{"base": base, "quote": quote, "since": since} for base, quote in sorted(set(pairs))]
+    if not params:
+        return
+    for p in params:
+        await s.execute(_LOCK_PAIR, {"base": p["base"], "quote": p["quote"]})
+    await s.execute(_REFRESH_HOURLY, params)
+    await s.execute(_REFRESH_DAILY, params)
+
+
+async def insert_rates(s: AsyncSession, rows: list[dict]) -> None:
+    """Insert captures ({base, quote, rate, provider}) and roll them up; caller commits."""
+    if not rows:
+        return
+    await s.execute(_INSERT_RATE, rows)
+    await refresh_rollups(s, ((row["base"], row["quote"]) for row in rows))
+
+
+def pick_interval(start: Optional[datetime], end: Optional[datetime], max_points: int) -> str:
+    """Finest resolution whose bucket count over [start, end] stays under ``max_points``.
+
+    Raw captures are only chosen for spans up to two days, since their
+    density depends on how often the pair is recorded.
+    """
+    if start is None:
+        return "raw"
+    hours = ((end or datetime.now(start.tzinfo)) - start).total_seconds() / 3600
+    if hours <= 48:
+        return "raw"
+    if hours <= max_points:
+        return "hour"
+    return "day"
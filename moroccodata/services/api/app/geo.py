@@ -0,0 +1,55 @@
+from math import radians, sin, cos, asin, sqrt, floor
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.195
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a)))
+
+
+def bbox_around(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """Return a (min_lat, min_lon, max_lat, max_lon) box enclosing a radius.
+
+    Conservative: every point within ``radius_km`` of (lat, lon) lies inside
+    the box, so it can be used as a prefilter before the exact haversine test.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    coslat = cos(radians(min(89.9, abs(lat) + dlat)))
+    dlon = min(180.0, radius_km / (KM_PER_DEG_LAT * coslat))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def snap_to_grid(lat: float, lon: float, cell_km: float) -> tuple[int, int, float, float]:
+    """Snap a point to a roughly ``cell_km``-sized grid cell.
+
+    Returns ``(row, col, centre_lat, centre_lon)``. Longitude steps widen
+    with latitude so cells stay close to square on the ground; the step is
+    fixed per row, so the same point always lands in the same cell.
+    """
+    dlat = cell_km / KM_PER_DEG_LAT
+    row = floor(lat / dlat)
+    centre_lat = (row + 0.5) * dlat
+    dlon = cell_km / (KM_PER_DEG_LAT * max(0.01, cos(radians(centre_lat))))
+    col = floor(lon / dlon)
+    return row, col, round(centre_lat, 4), round((col + 0.5) * dlon, 4)
+
+
+def encode_polyline(points: list[tuple[float, float]]) -> str:
+    """Encode (lat, lon) points in Google's encoded polyline format (1e-5 precision)."""
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        ilat, ilon = round(lat * 1e5), round(lon * 1e5)
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
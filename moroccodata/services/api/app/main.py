@@ -1,18 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from .core.http import upstream
+from .core import redis as redis_cache
+from .fx_recorder import record_loop, FX_RECORD_ENABLED
+from . import optimize_jobs
+
 from .routers.cities import router as cities_router
-from .routers.signals import router as signals_router
+from .routers.signals import router as signals_router, weather_prewarm_loop, WEATHER_PREWARM
 from .routers.health import router as health_router
 from .routers.trips import router as trips_router
+from .routers.places import router as places_router
+from .routers.search import router as search_router
+from .routers.maps import router as maps_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    upstream.open()
+    background = []
+    if WEATHER_PREWARM:
+        background.append(asyncio.create_task(weather_prewarm_loop()))
+    if FX_RECORD_ENABLED:
+        background.append(asyncio.create_task(record_loop()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        optimize_jobs.shutdown()
+        await upstream.aclose()
+        await redis_cache.close()
+
+app = FastAPI(title="MoroccoData API", version="1.0.0", lifespan=lifespan)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    """FastAPI's default 422, except NaN/inf inputs are echoed as strings.
 
-app = FastAPI(title="MoroccoData API", version="1.0.0")
+    Python's JSON parser accepts NaN and Infinity, but they cannot be
+    written back out as strict JSON, so the default handler fails with a 500.
+    """
+    errors = [
+        {**e, "input": repr(e["input"])}
+        if isinstance(e.get("input"), float) and not math.isfinite(e["input"]) else e
+        for e in exc.errors()
+    ]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
 
 # Mount feature routers
 app.include_router(health_router)
 app.include_router(cities_router)
 app.include_router(signals_router)
 app.include_router(trips_router)
+app.include_router(places_router)
+app.include_router(search_router)
+app.include_router(maps_router)
 
 # Frontend-compatible /plan endpoint
 @app.get("/plan")
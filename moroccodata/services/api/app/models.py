@@ -29,6 +29,10 @@ class Place(Base):
 
     city: Mapped[City] = relationship(back_populates="places")
 
+    __table_args__ = (
+        Index('idx_place_city_id_id', 'city_id', 'id'),
+    )
+
 
 class Trip(Base):
     __tablename__ = "trips"
@@ -50,6 +54,9 @@ class Trip(Base):
         Index('idx_trip_user_id', 'user_id'),
         Index('idx_trip_session_id', 'session_id'),
         Index('idx_trip_city_slug', 'city_slug'),
+        # keyset pagination of GET /trips walks (created_at, id) per owner
+        Index('idx_trip_user_created', 'user_id', 'created_at', 'id'),
+        Index('idx_trip_session_created', 'session_id', 'created_at', 'id'),
     )
 
 
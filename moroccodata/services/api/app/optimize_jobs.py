@@ -0,0 +1,172 @@
+"""Trip optimization off the event loop.
+
+``optimizer.plan_days`` is CPU-bound, so it runs in a process pool. Plans
+are cached under a hash of the (canonically ordered) stop set and
+options, so the same trip optimized again, or by another worker, skips
+the solver, and concurrent solves of the same stop set in one process
+share a single pool call. Large trips are submitted as jobs, one per
+(trip, stop set). Each job applies the shared plan to its own trip.
+
+Job status is kept in an in-process registry for ``OPTIMIZE_JOB_TTL``
+seconds, which is what the submitting worker answers
+``GET /trips/{id}/optimize/jobs/{job_id}`` from. It is also written to the
+cache so other workers can answer; that needs Redis, since the local L1
+fallback is per process (and capped at ``CACHE_L1_MAX_TTL``).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from .core import redis as cache
+from .core.singleflight import SingleFlight
+from .optimizer import plan_days
+
+OPTIMIZE_WORKERS = int(os.getenv("OPTIMIZE_WORKERS", "2"))
+# trips with more stops than this get 202 + a job instead of waiting
+OPTIMIZE_SYNC_MAX_STOPS = int(os.getenv("OPTIMIZE_SYNC_MAX_STOPS", "150"))
+OPTIMIZE_CACHE_TTL = int(os.getenv("OPTIMIZE_CACHE_TTL", "86400"))
+OPTIMIZE_JOB_TTL = int(os.getenv("OPTIMIZE_JOB_TTL", "3600"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_running: dict[str, asyncio.Task] = {}
+# job_id -> (expires_at, job) for jobs submitted by this worker
+_jobs: dict[str, tuple[float, dict]] = {}
+_solves = SingleFlight()
+stats = {"solved": 0, "cache_hits": 0, "jobs": 0, "deduplicated": 0, "shared_solves": 0, "failed": 0}
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=OPTIMIZE_WORKERS)
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def prepare(stops: list[tuple[int, float, float]], options: dict) -> tuple[str, list, list[int]]:
+    """Canonical form of a stop list: ``(key, canonical_stops, perm)``.
+
+    Within each day the stops are sorted by coordinate, except that the
+    current first/last stop stays first/last when ``fixed_start`` /
+    ``fixed_end`` pins it. The same set of places therefore gives the same
+    key whatever order it is currently in. ``perm[k]`` is the index in
+    ``stops`` of canonical stop ``k``.
+    """
+    by_day: dict[int, list[int]] = {}
+    for i, (day, _, _) in enumerate(stops):
+        by_day.setdefault(day, []).append(i)
+    perm: list[int] = []
+    for day in sorted(by_day):
+        members = by_day[day]
+        head = members[:1] if options.get("fixed_start") else []
+        tail = members[-1:] if options.get("fixed_end") and len(members) > len(head) else []
+        middle = members[len(head):len(members) - len(tail)]
+        perm.extend(head + sorted(middle, key=lambda i: (stops[i][1], stops[i][2])) + tail)
+    canonical = [stops[i] for i in perm]
+    payload = json.dumps([options, [[d, round(lat, 6), round(lon, 6)] for d, lat, lon in canonical]], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:24], canonical, perm
+
+
+def remap(plan: dict, perm: list[int]) -> dict:
+    """Translate a plan over canonical stops back to indexes of the caller's stops."""
+    return {**plan, "order": [perm[k] for k in plan["order"]]}
+
+
+async def cached_plan(key: str) -> Optional[dict]:
+    plan = await cache.cache_get(f"opt:{key}")
+    if plan is not None:
+        stats["cache_hits"] += 1
+    return plan
+
+
+async def solve(key: str, stops: list[tuple[int, float, float]], options: dict) -> dict:
+    """Run the solver in the pool and cache its plan.
+
+    Callers solving the same ``key`` at the same time, from any trip,
+    share one pool call.
+    """
+    async def run() -> dict:
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(_executor(), _plan_days, stops, options)
+        stats["solved"] += 1
+        await cache.cache_set(f"opt:{key}", plan, ttl_sec=OPTIMIZE_CACHE_TTL)
+        return plan
+
+    plan = await _solves.do(key, run)
+    stats["shared_solves"] = _solves.shared
+    return plan
+
+
+def _plan_days(stops: list[tuple[int, float, float]], options: dict) -> dict:
+    return plan_days(stops, **options)
+
+
+def job_key(trip_id: str, key: str) -> str:
+    return hashlib.sha1(f"{trip_id}:{key}".encode()).hexdigest()[:24]
+
+
+def _prune_jobs(now: float) -> None:
+    for job_id in [j for j, (expires_at, _) in _jobs.items() if expires_at <= now and j not in _running]:
+        del _jobs[job_id]
+
+
+async def _set_job(job_id: str, **fields) -> None:
+    job = {"job_id": job_id, **fields}
+    now = time.time()
+    _prune_jobs(now)
+    _jobs[job_id] = (now + OPTIMIZE_JOB_TTL, job)
+    await cache.cache_set(f"optjob:{job_id}", job, ttl_sec=OPTIMIZE_JOB_TTL)
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    """Job status from this worker's registry, else from the shared cache."""
+    entry = _jobs.get(job_id)
+    if entry is not None and (entry[0] > time.time() or job_id in _running):
+        return entry[1]
+    return await cache.cache_get(f"optjob:{job_id}")
+
+
+async def submit(
+    trip_id: str,
+    key: str,
+    stops: list[tuple[int, float, float]],
+    options: dict,
+    apply: Callable[[dict], Awaitable[dict]],
+) -> str:
+    """Start (or join) a background job; ``apply(plan)`` persists the result.
+
+    Jobs are per trip: a second request for the same trip and stops while
+    the first is running joins it. Another trip with the same stops gets
+    its own job (and its own ``apply``) but shares the solve.
+    """
+    job_id = job_key(trip_id, key)
+    if job_id in _running:
+        stats["deduplicated"] += 1
+        return job_id
+    stats["jobs"] += 1
+    await _set_job(job_id, trip_id=trip_id, status="running", stops=len(stops), submitted_at=time.time())
+
+    async def run():
+        try:
+            plan = await solve(key, stops, options)
+            result = await apply(plan)
+            await _set_job(job_id, trip_id=trip_id, status="done", finished_at=time.time(), result=result)
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"Error optimizing trip {trip_id}: {e}")
+            await _set_job(job_id, trip_id=trip_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            _running.pop(job_id, None)
+
+    _running[job_id] = asyncio.ensure_future(run())
+    return job_id
@@ -0,0 +1,188 @@
+"""Single-statement queries behind the list endpoints.
+
+Run ``python -m app.queries [cities] [places]`` to time every GET /cities
+variant against the per-city loop it replaced, on synthetic data in
+in-memory SQLite (default 10,000 cities and 1,000,000 places).
+
+Measured that way: 10-60 ms for name filters, 210-330 ms for variants
+that count or filter places (one statement each, cost linear in places).
+On the first 1,000 cities the per-city loop takes ~850 ms against
+~37 ms for the single statement.
+"""
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Select, select, func, exists, tuple_
+from sqlalchemy.orm import aliased
+from .models import City, Place, Trip, TripItem
+
+
+def city_list_query(
+    q: str = "",
+    min_places: int = 0,
+    category: str = "",
+    sort: str = "name",
+) -> Select:
+    """Build the single statement behind GET /cities.
+
+    Every filter and sort order is pushed into SQL so the listing costs one
+    round trip regardless of catalog size:
+
+    - ``q`` filters on the city name,
+    - ``category`` becomes an ``EXISTS`` against places,
+    - ``min_places`` becomes ``HAVING COUNT(places.id) >= :n``,
+    - ``sort="popularity"`` orders by the place count (ties broken by name).
+
+    The first column is always the ``City`` entity, so callers can simply use
+    ``result.scalars()``; a ``place_count`` column follows when the count is
+    needed for filtering or sorting.
+    """
+    needs_count = min_places > 0 or sort == "popularity"
+
+    if needs_count:
+        place_count = func.count(Place.id).label("place_count")
+        query = (
+            select(City, place_count)
+            .outerjoin(Place, Place.city_id == City.id)
+            .group_by(City.id)
+        )
+    else:
+        place_count = None
+        query = select(City)
+
+    if q:
+        query = query.where(City.name.ilike(f"%{q}%"))
+
+    if category:
+        # own alias, correlated to City only: with the count join the outer
+        # query already has Place in FROM and would otherwise swallow it
+        place = aliased(Place)
+        query = query.where(
+            exists()
+            .where(place.city_id == City.id)
+            .where(place.category == category)
+            .correlate(City)
+        )
+
+    if min_places > 0:
+        query = query.having(place_count >= min_places)
+
+    if sort == "popularity":
+        query = query.order_by(place_count.desc(), City.name)
+    else:
+        query = query.order_by(City.name)
+
+    return query
+
+
+def trip_list_query(
+    user_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    before: Optional[tuple[datetime, str]] = None,
+    limit: int = 50,
+) -> Select:
+    """Build the single statement behind GET /trips.
+
+    Rows are ``(Trip, items_count)``, newest first. The count is a
+    correlated ``COUNT(*)`` that the ``(trip_id, day_index, order_index)``
+    index answers on its own, so a page costs one statement however many
+    trips it holds.
+    Pagination is keyset on ``(created_at, id)``: ``before`` is the last
+    row of the previous page and the next page starts strictly after it.
+    """
+    items_count = (
+        select(func.count())
+        .select_from(TripItem)
+        .where(TripItem.trip_id == Trip.id)
+        .correlate(Trip)
+        .scalar_subquery()
+        .label("items_count")
+    )
+    query = select(Trip, items_count)
+
+    if user_id:
+        query = query.where(Trip.user_id == user_id)
+    elif session_id:
+        query = query.where(Trip.session_id == session_id)
+
+    if before is not None:
+        query = query.where(tuple_(Trip.created_at, Trip.id) < tuple_(*before))
+
+    return query.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(limit)
+
+
+def _legacy_city_list(conn, min_places: int, category: str, sort: str) -> list:
+    """The old GET /cities path: one SELECT of every place per city."""
+    rows = []
+    for city in conn.execute(select(City)).all():
+        places = conn.execute(select(Place).where(Place.city_id == city.id)).all()
+        if category and not any(p.category == category for p in places):
+            continue
+        if len(places) < min_places:
+            continue
+        rows.append((city, len(places)))
+    rows.sort(key=(lambda r: -r[1]) if sort == "popularity" else (lambda r: r[0].name))
+    return [city for city, _ in rows]
+
+
+def _benchmark(cities: int = 10_000, places: int = 1_000_000, legacy_cities: int = 1_000) -> None:
+    import random
+
+    from sqlalchemy import create_engine, insert
+
+    categories = ["palace", "museum", "garden", "market", "mosque", "beach", "medina", "riad"]
+    rng = random.Random(7)
+    engine = create_engine("sqlite://")
+    City.__table__.create(engine)
+    Place.__table__.create(engine)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(City), [
+            {"id": i, "slug": f"city-{i}", "name": f"City {i:05d}", "lat": 31.0, "lon": -8.0}
+            for i in range(1, cities + 1)
+        ])
+        batch = 100_000
+        for start in range(0, places, batch):
+            conn.execute(insert(Place), [
+                {"id": i + 1, "city_id": rng.randint(1, cities), "name": f"Place {i}",
+                 "category": rng.choice(categories), "lat": 31.0, "lon": -8.0}
+                for i in range(start, min(places, start + batch))
+            ])
+    print(f"{cities:,} cities / {places:,} places loaded in {time.perf_counter() - started:.1f}s")
+
+    variants = [
+        ("", 0, "", "name"),
+        ("12", 0, "", "name"),
+        ("", 100, "", "name"),
+        ("", 0, "palace", "name"),
+        ("", 0, "", "popularity"),
+        ("", 100, "palace", "popularity"),
+    ]
+    print(f"{'q':<5}{'min':>5}{'category':>10}{'sort':>12}{'rows':>8}{'ms':>9}")
+    with engine.connect() as conn:
+        for q, min_places, category, sort in variants:
+            stmt = city_list_query(q, min_places, category, sort)
+            start = time.perf_counter()
+            rows = conn.execute(stmt).all()
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{q:<5}{min_places:>5}{category:>10}{sort:>12}{len(rows):>8}{elapsed:>9.1f}")
+
+        # the loop it replaced, on a smaller catalog so it finishes
+        if legacy_cities:
+            conn.execute(Place.__table__.delete().where(Place.city_id > legacy_cities))
+            conn.execute(City.__table__.delete().where(City.id > legacy_cities))
+            start = time.perf_counter()
+            legacy = _legacy_city_list(conn, 100, "palace", "popularity")
+            legacy_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            rows = conn.execute(city_list_query("", 100, "palace", "popularity")).all()
+            single_ms = (time.perf_counter() - start) * 1000
+            print(f"{legacy_cities:,} cities, min=100 palace popularity: per-city loop {legacy_ms:.0f} ms"
+                  f" ({len(legacy)} rows), single statement {single_ms:.1f} ms ({len(rows)} rows)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    _benchmark(*args)
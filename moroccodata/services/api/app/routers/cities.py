@@ -1,16 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
-from ..core.db import get_session
+from typing import Optional
+import json
+from ..core.db import get_session, SessionLocal
 from ..models import City, Place
 from ..seed import seed
+from ..queries import city_list_query
+from .. import catalog
 
 router = APIRouter(prefix="/cities", tags=["cities"])
 
+# Catalog data only changes on seed/clear; let clients and the service worker
+# reuse a response briefly and revalidate it in the background after that.
+CATALOG_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+
+def _catalog_headers(snapshot: catalog.CatalogSnapshot, variant: str = "") -> dict:
+    return {
+        "ETag": f'"{snapshot.digest}{variant}"',
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Accept",
+    }
+
+def _not_modified(request: Request, headers: dict) -> Optional[Response]:
+    """Return a 304 response if the client already holds this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = headers["ETag"]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in (etag, "*"):
+            return Response(status_code=304, headers=headers)
+    return None
+
 @router.post("/admin/seed")
 async def admin_seed(db: AsyncSession = Depends(get_session), force: bool = False):
     """Seed the database with comprehensive city and place data. Idempotent operation unless force=True."""
-    return await seed(db, force=force)
+    result = await seed(db, force=force)
+    await catalog.refresh(db)
+    return result
 
 @router.post("/admin/clear")
 async def admin_clear(db: AsyncSession = Depends(get_session)):
@@ -18,10 +50,13 @@ async def admin_clear(db: AsyncSession = Depends(get_session)):
     await db.execute(delete(Place))
     await db.execute(delete(City))
     await db.commit()
+    await catalog.refresh(db)
     return {"cleared": True, "message": "All data cleared from database"}
 
 @router.get("")
 async def list_cities(
+    request: Request,
+    response: Response,
     q: str = Query("", description="Search query for city names"),
     min_places: int = Query(0, description="Minimum number of places"),
     category: str = Query("", description="Filter by place category"),
@@ -29,51 +64,17 @@ async def list_cities(
     db: AsyncSession = Depends(get_session)
 ):
     """Get all cities with optional search and filtering."""
-    # Start with basic query
-    query = select(City)
-    
-    # Apply search filter
-    if q:
-        query = query.where(City.name.ilike(f"%{q}%"))
-    
-    # For complex filters, we'll use a simpler approach
-    if category or min_places > 0 or sort == "popularity":
-        # Get all cities first, then filter in Python for simplicity
-        result = await db.execute(query)
-        all_cities = result.scalars().all()
-        
-        # Filter cities based on criteria
-        filtered_cities = []
-        for city in all_cities:
-            # Get places for this city
-            places_result = await db.execute(
-                select(Place).where(Place.city_id == city.id)
-            )
-            places = places_result.scalars().all()
-            
-            # Apply category filter
-            if category:
-                if not any(place.category == category for place in places):
-                    continue
-            
-            # Apply minimum places filter
-            if min_places > 0 and len(places) < min_places:
-                continue
-            
-            filtered_cities.append((city, len(places)))
-        
-        # Apply sorting
-        if sort == "popularity":
-            filtered_cities.sort(key=lambda x: x[1], reverse=True)
-        else:
-            filtered_cities.sort(key=lambda x: x[0].name)
-        
-        cities = [city for city, _ in filtered_cities]
-    else:
-        # Simple case - just apply search and name sorting
-        query = query.order_by(City.name)
-        result = await db.execute(query)
-        cities = result.scalars().all()
+    snapshot = await catalog.get(db)
+    if snapshot is not None:
+        headers = _catalog_headers(snapshot)
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+        response.headers.update(headers)
+        return {"cities": snapshot.list_cities(q, min_places, category, sort)}
+
+    result = await db.execute(city_list_query(q, min_places, category, sort))
+    cities = result.scalars().all()
     
     items = []
     for c in cities:
@@ -89,8 +90,26 @@ async def list_cities(
 
 # NEW: city detail (used by /api/cities/[slug] in the Next.js app)
 @router.get("/{slug}")
-async def city_detail(slug: str, db: AsyncSession = Depends(get_session)):
+async def city_detail(slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_session)):
     """Get detailed information about a specific city including places and categories."""
+    snapshot = await catalog.get(db)
+    if snapshot is not None:
+        city = snapshot.city(slug)
+        if not city:
+            raise HTTPException(status_code=404, detail="City not found")
+        headers = _catalog_headers(snapshot)
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+        response.headers.update(headers)
+        categories = dict(snapshot.city_categories(slug))
+        return {
+            "city": city,
+            "places": list(snapshot.city_places(slug)[:8]),
+            "count": sum(categories.values()),
+            "categories": categories,
+        }
+
     q = await db.execute(select(City).where(City.slug == slug))
     city = q.scalars().first()
     if not city:
@@ -130,14 +149,84 @@ async def city_detail(slug: str, db: AsyncSession = Depends(get_session)):
         "categories": categories,
     }
 
+def _place_row(p: Place) -> dict:
+    return {"id": p.id, "name": p.name, "category": p.category, "lat": p.lat, "lon": p.lon}
+
+async def _stream_places_ndjson(city_id: int, after: int, limit: Optional[int]):
+    """Yield one JSON line per place, reading rows from the DB as they arrive."""
+    query = (
+        select(Place)
+        .where(Place.city_id == city_id)
+        .where(Place.id > after)
+        .order_by(Place.id)
+        .execution_options(yield_per=500)
+    )
+    if limit:
+        query = query.limit(limit)
+    # own session: the request-scoped one may be closed before the body is sent
+    async with SessionLocal() as s:
+        rows = await s.stream_scalars(query)
+        async for p in rows:
+            yield json.dumps(_place_row(p), ensure_ascii=False) + "\n"
+
 @router.get("/{slug}/places")
-async def city_places(slug: str, db: AsyncSession = Depends(get_session)):
-    """Get all places for a specific city."""
+async def city_places(
+    slug: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every place"),
+    after: int = Query(0, ge=0, description="Return places with id greater than this cursor"),
+    db: AsyncSession = Depends(get_session)
+):
+    """Get places for a specific city, optionally paginated by id cursor.
+
+    Pass ``next_after`` from one page as ``after`` to fetch the next. With
+    ``Accept: application/x-ndjson`` the places are streamed one JSON object
+    per line instead of being collected into a single document.
+    """
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    snapshot = await catalog.get(db)
+
+    if snapshot is not None:
+        city = snapshot.city(slug)
+        if not city:
+            raise HTTPException(status_code=404, detail="City not found")
+        headers = _catalog_headers(snapshot, "-ndjson" if ndjson else "")
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+        places = snapshot.city_places_page(slug, after, limit)
+        if ndjson:
+            return StreamingResponse(
+                (json.dumps(p, ensure_ascii=False) + "\n" for p in places),
+                media_type="application/x-ndjson",
+                headers=headers,
+            )
+        response.headers.update(headers)
+        return {
+            "city": {"id": city["id"], "slug": city["slug"], "name": city["name"]},
+            "places": list(places),
+            "next_after": places[-1]["id"] if limit and len(places) == limit else None,
+        }
+
     q = await db.execute(select(City).where(City.slug == slug))
     city = q.scalars().first()
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
-    
-    q2 = await db.execute(select(Place).where(Place.city_id == city.id))
-    places = [{"id": p.id, "name": p.name, "category": p.category, "lat": p.lat, "lon": p.lon} for p in q2.scalars()]
-    return {"city": {"id": city.id, "slug": city.slug, "name": city.name}, "places": places}
\ No newline at end of file
+
+    if ndjson:
+        return StreamingResponse(
+            _stream_places_ndjson(city.id, after, limit),
+            media_type="application/x-ndjson",
+        )
+
+    query = select(Place).where(Place.city_id == city.id).where(Place.id > after).order_by(Place.id)
+    if limit:
+        query = query.limit(limit)
+    q2 = await db.execute(query)
+    places = [_place_row(p) for p in q2.scalars()]
+    return {
+        "city": {"id": city.id, "slug": city.slug, "name": city.name},
+        "places": places,
+        "next_after": places[-1]["id"] if limit and len(places) == limit else None,
+    }
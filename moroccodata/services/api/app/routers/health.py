@@ -2,6 +2,11 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from ..core.db import get_session
+from ..core.http import upstream
+from ..core import redis as cache
+from ..core.singleflight import flight, hit_stats
+from ..core.routing import providers
+from .. import fx_recorder, optimize_jobs
 
 router = APIRouter()
 
@@ -9,4 +14,17 @@ router = APIRouter()
 async def health(db: AsyncSession = Depends(get_session)):
     result = await db.execute(text("SELECT 1"))
     row = result.scalar()
-    return {"ok": True, "db": bool(row)}
\ No newline at end of file
+    return {"ok": True, "db": bool(row)}
+
+@router.get("/health/metrics")
+async def metrics():
+    """Upstream latencies and cache tier counters for this worker."""
+    return {
+        "upstream": upstream.metrics(),
+        "routing": providers.metrics(),
+        "cache": cache.metrics(),
+        "singleflight": flight.stats(),
+        "hit_ratio": hit_stats(),
+        "fx_recorder": fx_recorder.stats,
+        "optimizer": optimize_jobs.stats,
+    }
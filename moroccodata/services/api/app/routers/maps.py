@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import numpy as np
+
+from ..matrix import SPEED_PROFILES, DEFAULT_MODE, distance_matrix_km, travel_minutes
+
+router = APIRouter(prefix="/maps", tags=["maps"])
+
+# The matrix itself takes ~10ms at this size; serializing 1M cells dominates
+MATRIX_MAX_POINTS = 1000
+
+
+class MatrixPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, allow_inf_nan=False)
+    lon: float = Field(..., ge=-180, le=180, allow_inf_nan=False)
+
+class MatrixRequest(BaseModel):
+    points: List[MatrixPoint] = Field(..., min_length=1, max_length=MATRIX_MAX_POINTS)
+    # without destinations the matrix is points x points
+    destinations: Optional[List[MatrixPoint]] = Field(None, min_length=1, max_length=MATRIX_MAX_POINTS)
+    mode: str = DEFAULT_MODE
+    durations: bool = True
+
+
+@router.post("/matrix")
+async def distance_matrix(body: MatrixRequest):
+    """All-pairs great-circle distances (m) and estimated travel times (s).
+
+    Computed locally, so it works without any maps API key. Travel times use
+    the ``walk`` or ``drive`` speed profile and are estimates, not routed.
+    Values are whole metres and seconds: integers serialize several times
+    faster than floats, which matters at a million cells.
+    """
+    if body.mode not in SPEED_PROFILES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SPEED_PROFILES)}")
+
+    origins = [(p.lat, p.lon) for p in body.points]
+    destinations = [(p.lat, p.lon) for p in body.destinations] if body.destinations else None
+    distances = distance_matrix_km(origins, destinations)
+
+    content = {
+        "provider": "haversine",
+        "mode": body.mode,
+        "rows": distances.shape[0],
+        "cols": distances.shape[1],
+        "distances_m": np.rint(distances * 1000).astype(np.int64).tolist(),
+    }
+    if body.durations:
+        content["durations_sec"] = np.rint(travel_minutes(distances, body.mode) * 60).astype(np.int64).tolist()
+    # plain lists of ints need no jsonable_encoder pass
+    return JSONResponse(content)
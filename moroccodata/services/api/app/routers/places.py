@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+import math
+
+from ..core.db import get_session
+from ..models import City, Place
+from ..geo import bbox_around
+from ..spatial import GridIndex
+from .. import catalog
+
+router = APIRouter(prefix="/places", tags=["places"])
+
+
+def _parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    try:
+        min_lat, min_lon, max_lat, max_lon = map(float, bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'min_lat,min_lon,max_lat,max_lon'")
+    if not all(math.isfinite(v) for v in (min_lat, min_lon, max_lat, max_lon)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite numbers")
+    if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox latitudes must be within ±90 and longitudes within ±180")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="bbox min must not exceed max")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+async def _index_from_db(db: AsyncSession, box: tuple[float, float, float, float], category: str) -> GridIndex:
+    """Fallback when no catalog snapshot is available: prefilter by box in SQL."""
+    min_lat, min_lon, max_lat, max_lon = box
+    query = (
+        select(Place, City.slug)
+        .join(City, City.id == Place.city_id)
+        .where(Place.lat.between(min_lat, max_lat))
+        .where(Place.lon.between(min_lon, max_lon))
+    )
+    if category:
+        query = query.where(Place.category == category)
+    rows = (await db.execute(query)).all()
+    return GridIndex(
+        (p.lat, p.lon, slug, {"id": p.id, "name": p.name, "category": p.category, "lat": p.lat, "lon": p.lon})
+        for p, slug in rows
+    )
+
+
+@router.get("/nearby")
+async def nearby_places(
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the search centre"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the search centre"),
+    radius_km: float = Query(2.0, gt=0, le=200, description="Search radius in kilometres"),
+    bbox: str = Query("", description="Bounding box as 'min_lat,min_lon,max_lat,max_lon'"),
+    category: str = Query("", description="Filter by place category"),
+    limit: int = Query(50, ge=1, le=1000),
+    db: AsyncSession = Depends(get_session)
+):
+    """Find places around a point or inside a bounding box, nearest first.
+
+    With ``bbox`` the results are every place inside the box, ordered by
+    distance from (lat, lon) when given or from the box centre otherwise.
+    Without it, ``lat``/``lon`` are required and ``radius_km`` applies.
+    """
+    if bbox:
+        box = _parse_bbox(bbox)
+        if lat is None or lon is None:
+            lat, lon = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    elif lat is None or lon is None:
+        raise HTTPException(status_code=400, detail="lat and lon are required unless bbox is given")
+    else:
+        box = bbox_around(lat, lon, radius_km)
+
+    snapshot = await catalog.get(db)
+    index = snapshot.spatial if snapshot is not None else await _index_from_db(db, box, category)
+
+    if bbox:
+        hits = index.within(*box, lat=lat, lon=lon, category=category, limit=limit)
+    else:
+        hits = index.nearby(lat, lon, radius_km, category=category, limit=limit)
+
+    return {
+        "center": {"lat": lat, "lon": lon},
+        "count": len(hits),
+        "places": [
+            {**place, "city_slug": slug, "distance_km": round(d, 3)}
+            for d, slug, place in hits
+        ],
+    }
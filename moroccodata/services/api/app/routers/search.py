@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from ..core.db import get_session
+from ..models import City, Place
+from .. import catalog, search as search_index
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, description="Typeahead query for city and place names"),
+    type: str = Query("", description="Restrict to 'city' or 'place'"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_session)
+):
+    """Ranked, accent-insensitive name search over cities and places."""
+    snapshot = await catalog.get(db)
+    if snapshot is not None:
+        if search_index.index.version != snapshot.version:
+            search_index.index.sync(snapshot)
+        docs = search_index.index.search(q, limit=limit, kind=type or None)
+        return {
+            "q": q,
+            "results": [
+                {
+                    "type": doc.kind,
+                    "id": doc.id,
+                    "name": doc.name,
+                    "city_slug": doc.city_slug,
+                    "category": doc.category,
+                }
+                for doc in docs
+            ],
+        }
+
+    # Fallback without a snapshot: plain ILIKE, no folding or ranking
+    results = []
+    if type in ("", "city"):
+        rows = await db.execute(select(City).where(City.name.ilike(f"%{q}%")).order_by(City.name).limit(limit))
+        results += [
+            {"type": "city", "id": c.id, "name": c.name, "city_slug": c.slug, "category": None}
+            for c in rows.scalars()
+        ]
+    if type in ("", "place") and len(results) < limit:
+        rows = await db.execute(
+            select(Place, City.slug)
+            .join(City, City.id == Place.city_id)
+            .where(Place.name.ilike(f"%{q}%"))
+            .order_by(Place.name)
+            .limit(limit - len(results))
+        )
+        results += [
+            {"type": "place", "id": p.id, "name": p.name, "city_slug": slug, "category": p.category}
+            for p, slug in rows.all()
+        ]
+    return {"q": q, "results": results}
@@ -1,19 +1,109 @@
 from fastapi import APIRouter, Query, HTTPException
-import httpx
+import asyncio
+from pydantic import BaseModel, Field
+import math
 import os
-from datetime import datetime
-from ..core.redis import cache_get, cache_set
-from sqlalchemy import text
+from datetime import datetime, timezone
+from typing import Optional, List
+from ..core.http import upstream
+from ..core.routing import providers
+from ..core.codec import project
+from ..core.singleflight import cached_fetch, cached_fetch_many, Fetched
+from sqlalchemy import text, select
 from ..core.db import SessionLocal
+from ..models import City
+from ..geo import snap_to_grid, encode_polyline
+from ..matrix import leg_distances_km, travel_minutes, format_km, format_minutes
+from .. import catalog
+from ..fx import FX_ANCHOR, fetch_fx_table, cross_rate
+from ..fx_rollups import ROLLUP_TABLES, insert_rates, pick_interval
 
 router = APIRouter()
 
 # Environment variables for API providers
-FX_PROVIDER = os.getenv("FX_PROVIDER", "er-api")
 FX_BASE_URL = os.getenv("FX_BASE_URL")
 REDIS_URL = os.getenv("REDIS_URL")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+# Soft TTL: served as fresh. Between soft and hard: served immediately while a
+# background refresh runs. Past hard: refetched, falling back to the stale
+# copy if the provider fails.
+WEATHER_SOFT_TTL = int(os.getenv("WEATHER_SOFT_TTL", "1800"))  # 30 minutes
+WEATHER_HARD_TTL = int(os.getenv("WEATHER_HARD_TTL", "10800"))  # 3 hours
+FX_SOFT_TTL = int(os.getenv("FX_SOFT_TTL", "43200"))  # 12 hours
+FX_HARD_TTL = int(os.getenv("FX_HARD_TTL", "86400"))  # 24 hours
+DIRECTIONS_SOFT_TTL = int(os.getenv("DIRECTIONS_SOFT_TTL", "604800"))  # 7 days
+DIRECTIONS_HARD_TTL = int(os.getenv("DIRECTIONS_HARD_TTL", "2592000"))  # 30 days
+
+# Directions are cached per route with every stop snapped to a
+# DIRECTIONS_GRID_M grid, so taps on the same landmark share one Google call
+DIRECTIONS_GRID_M = float(os.getenv("DIRECTIONS_GRID_M", "50"))
+
+# Upper bound on points per /signals/fx/history response; about five years of daily buckets
+FX_HISTORY_MAX_POINTS = int(os.getenv("FX_HISTORY_MAX_POINTS", "2000"))
+
+# Open-Meteo accepts comma-separated coordinate lists; keep URLs a sane length
+WEATHER_BATCH_CHUNK = 50
+
+# Weather cache keys are spatially quantized so nearby requests share an entry:
+# points within WEATHER_SNAP_CITY_KM of a seeded city use that city's entry,
+# everything else snaps to a WEATHER_GRID_KM grid. 0 disables either step.
+WEATHER_SNAP_CITY_KM = float(os.getenv("WEATHER_SNAP_CITY_KM", "5"))
+WEATHER_GRID_KM = float(os.getenv("WEATHER_GRID_KM", "2"))
+WEATHER_PREWARM = os.getenv("WEATHER_PREWARM", "true").lower() == "true"
+WEATHER_PREWARM_INTERVAL = int(os.getenv("WEATHER_PREWARM_INTERVAL", "1500"))  # under the soft TTL
+# Optional projection of cached Open-Meteo payloads, e.g.
+# "current_weather,daily,hourly.time,hourly.temperature_2m"; empty keeps everything
+WEATHER_CACHE_FIELDS = [f.strip() for f in os.getenv("WEATHER_CACHE_FIELDS", "").split(",") if f.strip()]
+
+class WeatherPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+class WeatherBatchRequest(BaseModel):
+    points: List[WeatherPoint] = Field(..., max_length=200)
+
+def _weather_anchor(lat: float, lon: float) -> tuple[str, float, float]:
+    """Cache key for a point plus the coordinates its forecast is fetched at."""
+    snapshot = catalog.current()
+    if WEATHER_SNAP_CITY_KM > 0 and snapshot is not None:
+        nearest = snapshot.city_spatial.nearby(lat, lon, WEATHER_SNAP_CITY_KM, limit=1)
+        if nearest:
+            _, slug, city = nearest[0]
+            return f"wx:city:{slug}", city["lat"], city["lon"]
+    if WEATHER_GRID_KM > 0:
+        row, col, anchor_lat, anchor_lon = snap_to_grid(lat, lon, WEATHER_GRID_KM)
+        return f"wx:g{WEATHER_GRID_KM:g}:{row}:{col}", anchor_lat, anchor_lon
+    return f"wx:{round(lat,3)}:{round(lon,3)}", lat, lon
+
+def _weather_url(lats: List[float], lons: List[float]) -> str:
+    return (
+        "https://api.open-meteo.com/v1/forecast"
+        f"?latitude={','.join(map(str, lats))}&longitude={','.join(map(str, lons))}"
+        "&hourly=temperature_2m,precipitation,wind_speed_10m"
+        "&daily=temperature_2m_max,temperature_2m_min,precipitation_sum&current_weather=true&timezone=auto"
+    )
+
+async def _get_weather(url: str):
+    res = await upstream.get("open-meteo", url)
+    res.raise_for_status()
+    data = res.json()
+    # a single location comes back as an object, several as a list
+    if isinstance(data, list):
+        return [project(d, WEATHER_CACHE_FIELDS) for d in data]
+    return project(data, WEATHER_CACHE_FIELDS)
+
+async def _fetch_weather(lat: float, lon: float) -> dict:
+    # Open-Meteo is the only weather provider, so there is nothing to hedge to;
+    # its circuit breaker still fails fast (serving stale cache) while it is down
+    return await providers.call("open-meteo", lambda: _get_weather(_weather_url([lat], [lon])))
+
+async def _fetch_weather_many(points: List[tuple[float, float]]) -> List[dict]:
+    """One Open-Meteo call for up to WEATHER_BATCH_CHUNK points, results in input order."""
+    url = _weather_url([p[0] for p in points], [p[1] for p in points])
+    data = await providers.call("open-meteo", lambda: _get_weather(url))
+    return data if isinstance(data, list) else [data]
+
 @router.get("/signals/weather")
 async def weather(lat: float = Query(...), lon: float = Query(...)):
     """Get weather data with caching and graceful fallback."""
@@ -21,25 +111,16 @@ async def weather(lat: float = Query(...), lon: float = Query(...)):
     if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
         raise HTTPException(status_code=400, detail="Invalid coordinates")
     
-    key = f"wx:{round(lat,3)}:{round(lon,3)}"
-    cached = cache_get(key)
-    if cached:
-        return {"cached": True, **cached}
-    
-    url = (
-        "https://api.open-meteo.com/v1/forecast"
-        f"?latitude={lat}&longitude={lon}&hourly=temperature_2m,precipitation,wind_speed_10m"
-        "&daily=temperature_2m_max,temperature_2m_min,precipitation_sum&current_weather=true&timezone=auto"
-    )
-    
+    key, anchor_lat, anchor_lon = _weather_anchor(lat, lon)
     try:
-        async with httpx.AsyncClient(timeout=8) as client:
-            res = await client.get(url)
-            res.raise_for_status()
-            data = res.json()
-        
-        cache_set(key, data, ttl_sec=1800)  # 30 minutes
-        return {"cached": False, **data}
+        # concurrent misses for the same key share one upstream call
+        res = await cached_fetch(
+            key,
+            lambda: _fetch_weather(anchor_lat, anchor_lon),
+            soft_ttl=WEATHER_SOFT_TTL,
+            hard_ttl=WEATHER_HARD_TTL,
+        )
+        return {"cached": res.cached, "age_sec": round(res.age_sec), "stale": res.stale, **res.value}
     except Exception as e:
         # Return 502 with JSON error instead of HTML
         raise HTTPException(
@@ -47,67 +128,115 @@ async def weather(lat: float = Query(...), lon: float = Query(...)):
             detail={"error": f"Weather service unavailable: {str(e)}", "provider": "open-meteo"}
         )
 
+async def _weather_for_points(points: List[tuple[float, float]], record: bool = True) -> List[Optional[Fetched]]:
+    """Weather for many points: one cache multi-get, then as few upstream calls as possible.
+
+    ``record=False`` keeps the lookups out of the cache hit statistics.
+    """
+    anchors = [_weather_anchor(lat, lon) for lat, lon in points]
+    coords = {key: (anchor_lat, anchor_lon) for key, anchor_lat, anchor_lon in anchors}
+
+    async def fetch_many(keys: List[str]) -> dict:
+        found = {}
+        chunks = [keys[i:i + WEATHER_BATCH_CHUNK] for i in range(0, len(keys), WEATHER_BATCH_CHUNK)]
+        results = await asyncio.gather(
+            *(_fetch_weather_many([coords[k] for k in chunk]) for chunk in chunks), return_exceptions=True
+        )
+        for chunk, data in zip(chunks, results):
+            if isinstance(data, Exception):
+                continue
+            found.update(zip(chunk, data))
+        return found
+
+    fetched = await cached_fetch_many(
+        list(coords), fetch_many, soft_ttl=WEATHER_SOFT_TTL, hard_ttl=WEATHER_HARD_TTL, record=record
+    )
+    return [fetched.get(key) for key, _, _ in anchors]
+
+@router.post("/signals/weather/batch")
+async def weather_batch(body: WeatherBatchRequest):
+    """Weather for many points, sharing cache entries with /signals/weather."""
+    fetched = await _weather_for_points([(p.lat, p.lon) for p in body.points])
+
+    results = []
+    for p, res in zip(body.points, fetched):
+        if res is None:
+            results.append({"lat": p.lat, "lon": p.lon, "error": "Weather service unavailable", "provider": "open-meteo"})
+        else:
+            results.append({
+                "lat": p.lat,
+                "lon": p.lon,
+                "cached": res.cached,
+                "age_sec": round(res.age_sec),
+                "stale": res.stale,
+                **res.value,
+            })
+    return {"count": len(results), "results": results}
+
+async def prewarm_weather() -> int:
+    """Fill the weather cache for every seeded city; returns how many were served."""
+    async with SessionLocal() as s:
+        # building the catalog snapshot lets city snapping apply to the keys
+        await catalog.get(s)
+        cities = (await s.execute(select(City.lat, City.lon))).all()
+    if not cities:
+        return 0
+    # prewarm traffic would inflate the hit ratio that user traffic is judged by
+    fetched = await _weather_for_points([(c.lat, c.lon) for c in cities], record=False)
+    return sum(1 for res in fetched if res is not None)
+
+async def weather_prewarm_loop() -> None:
+    """Run prewarm_weather at startup and then every WEATHER_PREWARM_INTERVAL seconds."""
+    while True:
+        try:
+            await prewarm_weather()
+        except Exception as e:
+            print(f"Weather prewarm failed: {e}")
+        await asyncio.sleep(WEATHER_PREWARM_INTERVAL)
+
+async def _fx_rates(base: str, quotes: List[str]) -> tuple[dict, Optional[Fetched]]:
+    """Rates from ``base`` to each of ``quotes`` out of one cached rate table.
+
+    The FX_ANCHOR table is tried first so every pair can usually be derived
+    from a single upstream call per refresh window; ``base``'s own table is
+    only fetched when the anchor table lacks one of the currencies.
+    """
+    res = None
+    rates: dict = {}
+    for table_base in dict.fromkeys([FX_ANCHOR, base]):
+        res = await cached_fetch(
+            f"fx:table:{table_base}",
+            lambda b=table_base: fetch_fx_table(b),
+            soft_ttl=FX_SOFT_TTL,
+            hard_ttl=FX_HARD_TTL,
+        )
+        if res.value is None:
+            continue
+        rates = {quote: cross_rate(res.value, base, quote) for quote in quotes}
+        if all(rate is not None for rate in rates.values()):
+            break
+    return rates, res
+
 @router.get("/signals/fx")
 async def fx(base: str = "USD", quote: str = "MAD"):
     """Get currency exchange rates with caching and multiple providers."""
     base = base.upper()
     quote = quote.upper()
-    key = f"fx:{base}:{quote}"
-
-    cached = cache_get(key)
-    if cached:
-        return {"cached": True, **cached}
-
-    providers = []
-    if FX_PROVIDER == "er-api":
-        providers.append(("er-api", f"https://open.er-api.com/v6/latest/{base}"))
-    elif FX_PROVIDER == "exchangerate_host":
-        providers.append(("exchangerate_host", f"https://api.exchangerate.host/latest?base={base}"))
-    elif FX_PROVIDER == "frankfurter":
-        providers.append(("frankfurter", f"https://api.frankfurter.app/latest?from={base}"))
-    else:
-        # Default fallback providers
-        providers = [
-            ("er-api", f"https://open.er-api.com/v6/latest/{base}"),
-            ("fawazahmed0", f"https://cdn.jsdelivr.net/gh/fawazahmed0/currency-api@1/latest/currencies/{base.lower()}/{quote.lower()}.json")
-        ]
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        for provider_name, url in providers:
-            try:
-                if provider_name == "er-api":
-                    r = await client.get(url)
-                    r.raise_for_status()
-                    j = r.json()
-                    if j.get("result") == "success" and quote in j.get("rates", {}):
-                        data = {
-                            "base": j["base_code"],
-                            "date": j.get("time_last_update_utc"),
-                            "quote": quote,
-                            "rate": j["rates"][quote],
-                            "provider": provider_name,
-                        }
-                        cache_set(key, data, ttl_sec=43200)  # 12 hours
-                        return {"cached": False, **data}
-                
-                elif provider_name == "fawazahmed0":
-                    r = await client.get(url)
-                    r.raise_for_status()
-                    j = r.json()
-                    rate = j.get(quote.lower())
-                    if rate is not None:
-                        data = {
-                            "base": base,
-                            "date": j.get("date"),
-                            "quote": quote,
-                            "rate": rate,
-                            "provider": provider_name,
-                        }
-                        cache_set(key, data, ttl_sec=43200)  # 12 hours
-                        return {"cached": False, **data}
-                        
-            except Exception:
-                continue
+    rates, res = await _fx_rates(base, [quote])
+    if rates.get(quote) is not None:
+        table = res.value
+        return {
+            "cached": res.cached,
+            "age_sec": round(res.age_sec),
+            "stale": res.stale,
+            "base": base,
+            "date": table["date"],
+            "quote": quote,
+            "rate": rates[quote],
+            "provider": table["provider"],
+            "derived": table["base"] != base,
+        }
 
     return {
         "cached": False,
@@ -115,57 +244,152 @@ async def fx(base: str = "USD", quote: str = "MAD"):
         "provider": "none"
     }
 
+@router.get("/signals/fx/batch")
+async def fx_batch(
+    base: str = "USD",
+    quotes: str = Query(..., description="Comma-separated quote currencies, e.g. 'MAD,EUR,GBP'"),
+):
+    """Many FX pairs for one base, all answered from a single rate-table snapshot."""
+    base = base.upper()
+    quote_list = list(dict.fromkeys(q.strip().upper() for q in quotes.split(",") if q.strip()))
+    if not quote_list:
+        raise HTTPException(status_code=400, detail="quotes must list at least one currency")
+
+    rates, res = await _fx_rates(base, quote_list)
+    if res is None or res.value is None:
+        return {
+            "cached": False,
+            "error": f"Could not fetch FX for {base} from any provider.",
+            "provider": "none"
+        }
+    table = res.value
+    return {
+        "cached": res.cached,
+        "age_sec": round(res.age_sec),
+        "stale": res.stale,
+        "base": base,
+        "date": table["date"],
+        "provider": table["provider"],
+        "derived": table["base"] != base,
+        "rates": {quote: rate for quote, rate in rates.items() if rate is not None},
+        "missing": [quote for quote, rate in rates.items() if rate is None],
+    }
+
+def _offline_directions(points: List[tuple[float, float]], mode: str) -> dict:
+    """Straight-line route estimate through ``points``, shaped like the Google answer."""
+    total_km = float(leg_distances_km(points).sum())
+    minutes = float(travel_minutes(total_km, mode))
+    return {
+        "provider": "haversine",
+        "available": True,
+        "estimated": True,
+        "mode": mode,
+        "distance": format_km(total_km),
+        "duration": format_minutes(minutes),
+        "distance_km": round(total_km, 3),
+        "duration_min": round(minutes, 1),
+        "polyline": encode_polyline(points),
+    }
+
+def _directions_key(points: List[tuple[float, float]], mode: str) -> str:
+    cells = []
+    for lat, lon in points:
+        row, col, _, _ = snap_to_grid(lat, lon, DIRECTIONS_GRID_M / 1000)
+        cells.append(f"{row},{col}")
+    return f"gd:{mode}:g{DIRECTIONS_GRID_M:g}:{'|'.join(cells)}"
+
+def _compact_route(data: dict) -> dict:
+    """The parts of a Google directions answer we serve: summary plus overview polyline."""
+    route = data["routes"][0]
+    distance_m = sum(leg["distance"]["value"] for leg in route["legs"])
+    duration_sec = sum(leg["duration"]["value"] for leg in route["legs"])
+    return {
+        "distance": format_km(distance_m / 1000) if len(route["legs"]) > 1 else route["legs"][0]["distance"]["text"],
+        "duration": format_minutes(duration_sec / 60) if len(route["legs"]) > 1 else route["legs"][0]["duration"]["text"],
+        "distance_m": distance_m,
+        "duration_sec": duration_sec,
+        "polyline": route["overview_polyline"]["points"],
+    }
+
 @router.get("/maps/directions")
 async def google_directions(
     origin: str = Query(..., description="Origin coordinates as 'lat,lon'"),
     destination: str = Query(..., description="Destination coordinates as 'lat,lon'"),
-    waypoints: str = Query("", description="Optional waypoints as 'lat,lon|lat,lon'")
+    waypoints: str = Query("", description="Optional waypoints as 'lat,lon|lat,lon'"),
+    mode: str = Query("drive", pattern="^(drive|walk)$", description="Travel mode"),
 ):
-    """Get directions from Google Maps API if available."""
-    if not GOOGLE_MAPS_API_KEY:
-        return {"provider": "none", "available": False}
-    
+    """Get directions from Google Maps API, or an offline estimate without it.
+
+    Google answers are cached per quantized route for DIRECTIONS_HARD_TTL.
+    When no API key is configured or Google fails, the answer is a
+    straight-line estimate from the local distance engine
+    (``"estimated": true``).
+    """
     try:
         # Parse coordinates
         origin_lat, origin_lon = map(float, origin.split(","))
         dest_lat, dest_lon = map(float, destination.split(","))
-        
-        # Build waypoints parameter
-        waypoints_param = ""
-        if waypoints:
-            waypoints_list = waypoints.split("|")
-            waypoints_param = "&waypoints=" + "|".join(waypoints_list)
-        
-        url = (
-            f"https://maps.googleapis.com/maps/api/directions/json"
-            f"?origin={origin_lat},{origin_lon}"
-            f"&destination={dest_lat},{dest_lon}"
-            f"{waypoints_param}"
-            f"&key={GOOGLE_MAPS_API_KEY}"
+        stops = []
+        for w in waypoints.split("|") if waypoints else []:
+            if not w:
+                continue
+            lat, lon = map(float, w.split(","))
+            stops.append((lat, lon))
+    except ValueError as e:
+        return {"provider": "none", "available": False, "error": str(e)}
+    points = [(origin_lat, origin_lon), *stops, (dest_lat, dest_lon)]
+    for lat, lon in points:
+        # float() accepts "nan"/"inf", which would break snapping and polyline encoding
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise HTTPException(status_code=400, detail=f"Invalid coordinates: {lat},{lon}")
+
+    if not GOOGLE_MAPS_API_KEY:
+        return _offline_directions(points, mode)
+    
+    # Build waypoints parameter
+    waypoints_param = ""
+    if stops:
+        waypoints_param = "&waypoints=" + "|".join(f"{lat},{lon}" for lat, lon in stops)
+    mode_param = "&mode=walking" if mode == "walk" else ""
+    
+    url = (
+        f"https://maps.googleapis.com/maps/api/directions/json"
+        f"?origin={origin_lat},{origin_lon}"
+        f"&destination={dest_lat},{dest_lon}"
+        f"{waypoints_param}"
+        f"{mode_param}"
+        f"&key={GOOGLE_MAPS_API_KEY}"
+    )
+    
+    async def fetch_directions() -> dict:
+        response = await upstream.get("google", url)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") != "OK":
+            # not cached: raise so the caller falls back to the estimate
+            raise ValueError(data.get("status") or "no route")
+        return _compact_route(data)
+    
+    try:
+        # concurrent misses for the same route share one Google call
+        res = await cached_fetch(
+            _directions_key(points, mode),
+            fetch_directions,
+            soft_ttl=DIRECTIONS_SOFT_TTL,
+            hard_ttl=DIRECTIONS_HARD_TTL,
         )
-        
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("status") != "OK":
-                return {"provider": "google", "available": False, "error": data.get("status")}
-            
-            # Extract summary information
-            route = data["routes"][0]
-            leg = route["legs"][0]
-            
-            return {
-                "provider": "google",
-                "available": True,
-                "distance": leg["distance"]["text"],
-                "duration": leg["duration"]["text"],
-                "polyline": route["overview_polyline"]["points"]
-            }
-            
+        if res.value is None:
+            raise ValueError("no route")
     except Exception as e:
-        return {"provider": "google", "available": False, "error": str(e)}
+        return {**_offline_directions(points, mode), "google_error": str(e)}
+    
+    return {
+        "provider": "google",
+        "available": True,
+        "cached": res.cached,
+        "age_sec": round(res.age_sec),
+        **res.value,
+    }
 
 @router.get("/maps/static")
 async def google_static_map(
@@ -206,79 +430,108 @@ async def google_static_map(
 async def fx_record(base: str = "USD", quote: str = "MAD"):
     base = base.upper()
     quote = quote.upper()
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r1 = await client.get(f"https://open.er-api.com/v6/latest/{base}")
-            r1.raise_for_status()
-            j1 = r1.json()
-            if j1.get("result") == "success" and quote in j1.get("rates", {}):
-                rate = float(j1["rates"][quote])
-                provider = "er-api"
-                async with SessionLocal() as s:
-                    await s.execute(
-                        text("""
-                            INSERT INTO fx_rates (base, quote, rate, provider)
-                            VALUES (:base, :quote, :rate, :provider)
-                        """),
-                        {"base": base, "quote": quote, "rate": rate, "provider": provider},
-                    )
-                    await s.commit()
-                return {"ok": True, "base": base, "quote": quote, "rate": rate, "provider": provider}
-        except Exception:
-            pass
-
-        try:
-            r2 = await client.get(
-                f"https://cdn.jsdelivr.net/gh/fawazahmed0/currency-api@1/latest/currencies/{base.lower()}/{quote.lower()}.json"
-            )
-            r2.raise_for_status()
-            j2 = r2.json()
-            rate = j2.get(quote.lower())
-            if rate is not None:
-                rate = float(rate)
-                provider = "fawazahmed0/currency-api"
-                async with SessionLocal() as s:
-                    await s.execute(
-                        text("""
-                            INSERT INTO fx_rates (base, quote, rate, provider)
-                            VALUES (:base, :quote, :rate, :provider)
-                        """),
-                        {"base": base, "quote": quote, "rate": rate, "provider": provider},
-                    )
-                    await s.commit()
-                return {"ok": True, "base": base, "quote": quote, "rate": rate, "provider": provider}
-        except Exception:
-            pass
+    try:
+        # hedged across FX_PROVIDER, skipping providers whose circuit is open
+        table = await fetch_fx_table(base)
+        rate = table["rates"].get(quote) if table else None
+        if rate is not None:
+            rate = float(rate)
+            provider = table["provider"]
+            async with SessionLocal() as s:
+                await insert_rates(s, [{"base": base, "quote": quote, "rate": rate, "provider": provider}])
+                await s.commit()
+            return {"ok": True, "base": base, "quote": quote, "rate": rate, "provider": provider}
+    except Exception:
+        pass
 
     return {"ok": False, "error": f"Could not record FX for {base}/{quote}"}
 
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def _iso(value) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
 @router.get("/signals/fx/history")
-async def fx_history(base: str = "USD", quote: str = "MAD", limit: int = 30):
+async def fx_history(
+    base: str = "USD",
+    quote: str = "MAD",
+    limit: Optional[int] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    interval: str = Query("auto", pattern="^(auto|raw|hour|day)$"),
+):
+    """Newest-first FX history for a pair.
+
+    ``interval`` picks raw captures or the hourly/daily OHLC rollups; with
+    ``auto`` the resolution follows the ``from``/``to`` span, so long ranges
+    read one row per day instead of every capture.
+    """
     base = base.upper()
     quote = quote.upper()
-    limit = max(1, min(limit, 365))
+    start, end = _utc(start), _utc(end)
+    if interval == "auto":
+        interval = pick_interval(start, end, FX_HISTORY_MAX_POINTS)
+    if limit is None:
+        limit = 30 if start is None else FX_HISTORY_MAX_POINTS
+    limit = max(1, min(limit, FX_HISTORY_MAX_POINTS))
+
+    params = {"base": base, "quote": quote, "start": start, "end": end, "limit": limit}
     async with SessionLocal() as s:
-        res = await s.execute(
-            text("""
-                SELECT base, quote, rate, provider, captured_at
-                FROM fx_rates
-                WHERE base = :base AND quote = :quote
-                ORDER BY captured_at DESC
-                LIMIT :limit
-            """),
-            {"base": base, "quote": quote, "limit": limit},
-        )
+        if interval == "raw":
+            res = await s.execute(
+                text("""
+                    SELECT base, quote, rate, provider, captured_at
+                    FROM fx_rates
+                    WHERE base = :base AND quote = :quote
+                      AND (CAST(:start AS timestamptz) IS NULL OR captured_at >= :start)
+                      AND (CAST(:end AS timestamptz) IS NULL OR captured_at < :end)
+                    ORDER BY captured_at DESC
+                    LIMIT :limit
+                """),
+                params,
+            )
+        else:
+            res = await s.execute(
+                text(f"""
+                    SELECT bucket, open, high, low, close, mean, samples
+                    FROM {ROLLUP_TABLES[interval]}
+                    WHERE base = :base AND quote = :quote
+                      AND (CAST(:start AS timestamptz) IS NULL OR bucket >= :start)
+                      AND (CAST(:end AS timestamptz) IS NULL OR bucket < :end)
+                    ORDER BY bucket DESC
+                    LIMIT :limit
+                """),
+                params,
+            )
         rows = res.fetchall()
-    return {
-        "base": base,
-        "quote": quote,
-        "count": len(rows),
-        "points": [
+
+    if interval == "raw":
+        points = [
+            {"rate": float(r.rate), "provider": r.provider, "captured_at": _iso(r.captured_at)}
+            for r in rows
+        ]
+    else:
+        points = [
             {
-                "rate": float(r.rate),
-                "provider": r.provider,
-                "captured_at": r.captured_at.isoformat() if hasattr(r.captured_at, "isoformat") else str(r.captured_at),
+                "bucket": _iso(r.bucket),
+                "open": float(r.open),
+                "high": float(r.high),
+                "low": float(r.low),
+                "close": float(r.close),
+                "mean": float(r.mean),
+                "samples": r.samples,
             }
             for r in rows
-        ],
-    }
\ No newline at end of file
+        ]
+    return {
+        "base": base,
+        "quote": quote,
+        "interval": interval,
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        "count": len(points),
+        "points": points,
+    }
@@ -1,16 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update, func
-from typing import Optional, List
-from pydantic import BaseModel
-from datetime import date, datetime
+from sqlalchemy import select, delete, insert, update
+from typing import Annotated, Optional, List, Literal, Union
+from pydantic import BaseModel, Field
+from datetime import date, datetime, timedelta
+import base64
+import os
 import uuid
 
-from ..core.db import get_session
-from ..models import Trip, TripItem
+from ..core.db import get_session, SessionLocal
+from ..models import Place, Trip, TripItem
+from ..queries import trip_list_query
+from ..matrix import DEFAULT_MODE, leg_distances_km, travel_minutes
+from ..scheduler import schedule
+from .. import optimize_jobs
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
+# Default local-search budget for POST /trips/{id}/optimize, shared across days
+OPTIMIZE_TIME_BUDGET_MS = int(os.getenv("OPTIMIZE_TIME_BUDGET_MS", "1000"))
+# Minutes of visits + travel per day that POST /trips/{id}/schedule aims for
+SCHEDULE_DAY_BUDGET_MIN = int(os.getenv("SCHEDULE_DAY_BUDGET_MIN", "480"))
+# Visit time for items without a place (or whose place has no extra.visit_time)
+SCHEDULE_DEFAULT_VISIT_MIN = int(os.getenv("SCHEDULE_DEFAULT_VISIT_MIN", "60"))
+# Most operations accepted by one POST /trips/{id}/items:batch
+ITEMS_BATCH_MAX_OPS = int(os.getenv("ITEMS_BATCH_MAX_OPS", "1000"))
+
 # Pydantic models for request/response
 class TripCreate(BaseModel):
     title: Optional[str] = "Untitled Trip"
@@ -46,8 +62,39 @@ class TripItemUpdate(BaseModel):
     notes: Optional[str] = None
     place_id: Optional[int] = None
 
+class BatchCreate(TripItemCreate):
+    op: Literal["create"]
+
+class BatchUpdate(TripItemUpdate):
+    op: Literal["update"]
+    id: str
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: str
+
+class BatchReorder(BaseModel):
+    op: Literal["reorder"]
+    id: str
+    day_index: int
+    order_index: int
+
+class TripItemBatch(BaseModel):
+    operations: List[Annotated[
+        Union[BatchCreate, BatchUpdate, BatchDelete, BatchReorder],
+        Field(discriminator="op"),
+    ]] = Field(..., max_length=ITEMS_BATCH_MAX_OPS)
+
 class TripOptimizeRequest(BaseModel):
-    method: Optional[str] = "nearest"  # "nearest" or "two_opt"
+    method: Literal["nearest", "two_opt"] = "nearest"  # two_opt adds 2-opt + Or-opt local search
+    fixed_start: bool = True  # keep each day's current first stop first
+    fixed_end: bool = False  # keep each day's current last stop last
+    time_budget_ms: int = Field(OPTIMIZE_TIME_BUDGET_MS, ge=10, le=10000)
+
+class TripScheduleRequest(BaseModel):
+    days: Optional[int] = Field(None, ge=1, le=60)  # overrides the trip's start_date..end_date
+    day_budget_min: int = Field(SCHEDULE_DAY_BUDGET_MIN, ge=30, le=1440)
+    mode: Literal["walk", "drive"] = DEFAULT_MODE
 
 @router.post("")
 async def create_trip(trip_data: TripCreate, db: AsyncSession = Depends(get_session)):
@@ -84,8 +131,17 @@ async def create_trip(trip_data: TripCreate, db: AsyncSession = Depends(get_sess
     }
 
 @router.get("/{trip_id}")
-async def get_trip(trip_id: str, db: AsyncSession = Depends(get_session)):
-    """Get a trip with its items."""
+async def get_trip(
+    trip_id: str,
+    mode: str = Query(DEFAULT_MODE, pattern="^(walk|drive)$", description="Travel mode for leg estimates"),
+    db: AsyncSession = Depends(get_session)
+):
+    """Get a trip with its items.
+
+    Each item carries ``leg_km``/``leg_min``: the straight-line distance and
+    estimated travel time from the previous item of the same day (None for
+    the first item of a day).
+    """
     result = await db.execute(select(Trip).where(Trip.id == trip_id))
     trip = result.scalar_one_or_none()
     
@@ -99,6 +155,8 @@ async def get_trip(trip_id: str, db: AsyncSession = Depends(get_session)):
         .order_by(TripItem.day_index, TripItem.order_index)
     )
     items = items_result.scalars().all()
+    legs_km = leg_distances_km([(item.lat, item.lon) for item in items])
+    legs_min = travel_minutes(legs_km, mode)
     
     return {
         "trip": {
@@ -123,9 +181,11 @@ async def get_trip(trip_id: str, db: AsyncSession = Depends(get_session)):
                 "day_index": item.day_index,
                 "order_index": item.order_index,
                 "notes": item.notes,
-                "place_id": item.place_id
+                "place_id": item.place_id,
+                "leg_km": round(float(legs_km[i - 1]), 3) if i and items[i - 1].day_index == item.day_index else None,
+                "leg_min": round(float(legs_min[i - 1]), 1) if i and items[i - 1].day_index == item.day_index else None,
             }
-            for item in items
+            for i, item in enumerate(items)
         ]
     }
 
@@ -180,34 +240,37 @@ async def delete_trip(trip_id: str, db: AsyncSession = Depends(get_session)):
     
     return {"deleted": True, "trip_id": trip_id}
 
+def _encode_cursor(trip: Trip) -> str:
+    raw = f"{trip.created_at.isoformat()}|{trip.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, trip_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), trip_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("")
 async def list_trips(
     user_id: Optional[str] = Query(None),
     session_id: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: AsyncSession = Depends(get_session)
 ):
-    """List trips filtered by user_id or session_id."""
-    query = select(Trip)
-    
-    if user_id:
-        query = query.where(Trip.user_id == user_id)
-    elif session_id:
-        query = query.where(Trip.session_id == session_id)
-    
-    query = query.order_by(Trip.created_at.desc())
-    
-    result = await db.execute(query)
-    trips = result.scalars().all()
-    
-    # Get item counts for each trip
-    trip_list = []
-    for trip in trips:
-        count_result = await db.execute(
-            select(func.count(TripItem.id)).where(TripItem.trip_id == trip.id)
-        )
-        items_count = count_result.scalar()
-        
-        trip_list.append({
+    """List trips filtered by user_id or session_id, newest first.
+
+    One query per page, item counts included. Pass ``next_cursor`` back as
+    ``cursor`` for the following page; it is None on the last page.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    result = await db.execute(trip_list_query(user_id, session_id, before, limit))
+    rows = result.all()
+    
+    trip_list = [
+        {
             "id": trip.id,
             "slug": trip.slug,
             "title": trip.title,
@@ -219,9 +282,14 @@ async def list_trips(
             "created_at": trip.created_at,
             "updated_at": trip.updated_at,
             "items_count": items_count
-        })
+        }
+        for trip, items_count in rows
+    ]
     
-    return {"trips": trip_list}
+    return {
+        "trips": trip_list,
+        "next_cursor": _encode_cursor(rows[-1][0]) if len(rows) == limit else None,
+    }
 
 @router.post("/{trip_id}/items")
 async def create_trip_item(trip_id: str, item_data: TripItemCreate, db: AsyncSession = Depends(get_session)):
@@ -325,13 +393,132 @@ async def delete_trip_item(trip_id: str, item_id: str, db: AsyncSession = Depend
     
     return {"deleted": True, "item_id": item_id}
 
+@router.post("/{trip_id}/items:batch")
+async def batch_trip_items(trip_id: str, batch: TripItemBatch, db: AsyncSession = Depends(get_session)):
+    """Create, update, delete and reorder items in one transaction.
+
+    Operations are validated up front (every id must belong to the trip,
+    and a deleted item cannot also be changed), then written as one DELETE,
+    one multi-row INSERT and one executemany UPDATE, so the cost is a
+    handful of statements whatever the batch size. Nothing is written if
+    any operation is invalid. ``created`` lists the new items in request
+    order.
+    """
+    result = await db.execute(select(Trip.id).where(Trip.id == trip_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    creates: List[dict] = []
+    changes: dict[str, dict] = {}
+    deletes: set[str] = set()
+    for op in batch.operations:
+        if op.op == "create":
+            creates.append({"id": str(uuid.uuid4()), "trip_id": trip_id, **op.model_dump(exclude={"op"})})
+        elif op.op == "delete":
+            deletes.add(op.id)
+        else:
+            fields = op.model_dump(exclude={"op", "id"}, exclude_unset=op.op == "update")
+            changes.setdefault(op.id, {}).update(fields)
+    
+    conflicts = deletes & changes.keys()
+    if conflicts:
+        raise HTTPException(status_code=400, detail=f"Items both deleted and changed: {', '.join(sorted(conflicts))}")
+    
+    referenced = deletes | changes.keys()
+    if referenced:
+        result = await db.execute(
+            select(TripItem.id)
+            .where(TripItem.trip_id == trip_id)
+            .where(TripItem.id.in_(referenced))
+        )
+        missing = referenced - set(result.scalars().all())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Trip items not found: {', '.join(sorted(missing))}")
+    
+    if deletes:
+        await db.execute(delete(TripItem).where(TripItem.trip_id == trip_id).where(TripItem.id.in_(deletes)))
+    if creates:
+        await db.execute(insert(TripItem), creates)
+    updates = [{"id": item_id, **fields} for item_id, fields in changes.items() if fields]
+    if updates:
+        await db.execute(update(TripItem), updates)
+    await db.commit()
+    
+    return {
+        "created": [
+            {
+                "id": item["id"],
+                "name": item["name"],
+                "category": item["category"],
+                "lat": item["lat"],
+                "lon": item["lon"],
+                "day_index": item["day_index"],
+                "order_index": item["order_index"],
+                "notes": item["notes"],
+                "place_id": item["place_id"]
+            }
+            for item in creates
+        ],
+        "updated": len(updates),
+        "deleted": len(deletes),
+    }
+
+async def _load_items(db: AsyncSession, trip_id: str) -> List[TripItem]:
+    result = await db.execute(
+        select(TripItem)
+        .where(TripItem.trip_id == trip_id)
+        .order_by(TripItem.day_index, TripItem.order_index)
+    )
+    return list(result.scalars().all())
+
+def _stops(items: List[TripItem]) -> List[tuple[int, float, float]]:
+    return [(item.day_index, item.lat, item.lon) for item in items]
+
+async def _apply_plan(db: AsyncSession, items: List[TripItem], plan: dict) -> dict:
+    """Write a plan's order (order_index restarting per day) and build the response."""
+    optimized_items = [items[i] for i in plan["order"]]
+    
+    # one executemany for every moved item
+    next_index: dict[int, int] = {}
+    positions = []
+    for item in optimized_items:
+        position = next_index.get(item.day_index, 0)
+        next_index[item.day_index] = position + 1
+        positions.append({"id": item.id, "order_index": position})
+    await db.execute(update(TripItem), positions)
+    
+    await db.commit()
+    
+    return {
+        "total_km": round(sum(day["total_km"] for day in plan["days"]), 3),
+        "days": plan["days"],
+        "items": [
+            {
+                "id": item.id,
+                "name": item.name,
+                "lat": item.lat,
+                "lon": item.lon,
+                "category": item.category,
+                "day_index": item.day_index,
+            }
+            for item in optimized_items
+        ]
+    }
+
 @router.post("/{trip_id}/optimize")
 async def optimize_trip(
     trip_id: str, 
     optimize_data: TripOptimizeRequest, 
     db: AsyncSession = Depends(get_session)
 ):
-    """Optimize trip item order using nearest neighbor algorithm."""
+    """Reorder each day's items into a short route.
+
+    Days are optimized separately over great-circle distances (see
+    ``app.optimizer.plan_days``) in a worker process. Trips up to
+    OPTIMIZE_SYNC_MAX_STOPS items are answered directly; larger ones get
+    ``202`` with a job to poll at ``status_url``. Plans are cached by item
+    set, so re-optimizing an unchanged trip is immediate.
+    """
     # Check if trip exists
     result = await db.execute(select(Trip).where(Trip.id == trip_id))
     trip = result.scalar_one_or_none()
@@ -339,58 +526,129 @@ async def optimize_trip(
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    # Get all items
-    items_result = await db.execute(
-        select(TripItem)
-        .where(TripItem.trip_id == trip_id)
-        .order_by(TripItem.day_index, TripItem.order_index)
-    )
-    items = items_result.scalars().all()
+    items = await _load_items(db, trip_id)
     
     if len(items) < 2:
         return {"items": [{"id": item.id, "name": item.name, "lat": item.lat, "lon": item.lon, "category": item.category} for item in items]}
     
-    # Simple nearest neighbor optimization
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        """Calculate approximate distance between two points."""
-        return ((lat2 - lat1) ** 2 + (lon2 - lon1) ** 2) ** 0.5
-    
-    # Start with first item
-    optimized_items = [items[0]]
-    remaining_items = items[1:]
-    
-    current_lat, current_lon = items[0].lat, items[0].lon
-    
-    while remaining_items:
-        # Find nearest item
-        nearest_item = min(remaining_items, key=lambda item: calculate_distance(
-            current_lat, current_lon, item.lat, item.lon
-        ))
+    options = {
+        "method": optimize_data.method,
+        "fixed_start": optimize_data.fixed_start,
+        "fixed_end": optimize_data.fixed_end,
+        "time_budget": optimize_data.time_budget_ms / 1000,
+    }
+    key, stops, perm = optimize_jobs.prepare(_stops(items), options)
+    plan = await optimize_jobs.cached_plan(key)
+    
+    if plan is None and len(items) > optimize_jobs.OPTIMIZE_SYNC_MAX_STOPS:
+        async def apply(plan: dict) -> dict:
+            async with SessionLocal() as s:
+                current = await _load_items(s, trip_id)
+                current_key, _, current_perm = optimize_jobs.prepare(_stops(current), options)
+                if current_key != key:
+                    raise ValueError("Trip items changed while optimizing; run it again")
+                return await _apply_plan(s, current, optimize_jobs.remap(plan, current_perm))
         
-        optimized_items.append(nearest_item)
-        remaining_items.remove(nearest_item)
-        current_lat, current_lon = nearest_item.lat, nearest_item.lon
-    
-    # Update order in database
-    for i, item in enumerate(optimized_items):
-        await db.execute(
-            update(TripItem)
-            .where(TripItem.id == item.id)
-            .values(order_index=i)
+        job_id = await optimize_jobs.submit(trip_id, key, stops, options, apply)
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job_id,
+                "status": "running",
+                "status_url": f"/trips/{trip_id}/optimize/jobs/{job_id}",
+            },
         )
     
+    cached = plan is not None
+    if plan is None:
+        plan = await optimize_jobs.solve(key, stops, options)
+    return {"cached": cached, **(await _apply_plan(db, items, optimize_jobs.remap(plan, perm)))}
+
+@router.get("/{trip_id}/optimize/jobs/{job_id}")
+async def optimize_job(trip_id: str, job_id: str):
+    """Status of a background optimization: running, done (with result) or failed."""
+    job = await optimize_jobs.get_job(job_id)
+    if job is None or job.get("trip_id") != trip_id:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+    return job
+
+def _visit_minutes(extra) -> float:
+    try:
+        return float((extra or {})["visit_time"])
+    except (KeyError, TypeError, ValueError):
+        return float(SCHEDULE_DEFAULT_VISIT_MIN)
+
+@router.post("/{trip_id}/schedule")
+async def schedule_trip(
+    trip_id: str,
+    schedule_data: TripScheduleRequest,
+    db: AsyncSession = Depends(get_session)
+):
+    """Spread a trip's items over its days and order each day.
+
+    The number of days comes from ``start_date``..``end_date`` (inclusive)
+    unless ``days`` is given. Items are grouped by location so each day's
+    visit minutes (the place's ``extra.visit_time``) plus travel minutes
+    stay close to an even share, then ordered into a short route (see
+    ``app.scheduler``). Every item's day_index/order_index is written in
+    one statement; days over ``day_budget_min`` are flagged, not trimmed.
+    """
+    result = await db.execute(select(Trip).where(Trip.id == trip_id))
+    trip = result.scalar_one_or_none()
+    
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    days = schedule_data.days
+    if days is None:
+        if not (trip.start_date and trip.end_date):
+            raise HTTPException(status_code=400, detail="Trip has no start_date/end_date; pass days")
+        days = (trip.end_date - trip.start_date).days + 1
+        if days < 1:
+            raise HTTPException(status_code=400, detail="Trip end_date is before start_date")
+    
+    items = await _load_items(db, trip_id)
+    if not items:
+        return {"days": [], "items": []}
+    
+    place_ids = {item.place_id for item in items if item.place_id is not None}
+    extras = {}
+    if place_ids:
+        rows = await db.execute(select(Place.id, Place.extra).where(Place.id.in_(place_ids)))
+        extras = dict(rows.all())
+    visits = [_visit_minutes(extras.get(item.place_id)) for item in items]
+    
+    plan = schedule([(item.lat, item.lon) for item in items], visits, days, schedule_data.day_budget_min, schedule_data.mode)
+    
+    await db.execute(
+        update(TripItem),
+        [
+            {"id": item.id, "day_index": plan["day_of"][i], "order_index": plan["order_of"][i]}
+            for i, item in enumerate(items)
+        ],
+    )
     await db.commit()
     
+    start = trip.start_date if schedule_data.days is None else None
+    for day in plan["days"]:
+        day["date"] = start + timedelta(days=day["day_index"]) if start else None
+        day["day_budget_min"] = schedule_data.day_budget_min
+    
+    order = sorted(range(len(items)), key=lambda i: (plan["day_of"][i], plan["order_of"][i]))
     return {
+        "days": plan["days"],
         "items": [
             {
-                "id": item.id,
-                "name": item.name,
-                "lat": item.lat,
-                "lon": item.lon,
-                "category": item.category
+                "id": items[i].id,
+                "name": items[i].name,
+                "lat": items[i].lat,
+                "lon": items[i].lon,
+                "category": items[i].category,
+                "day_index": plan["day_of"][i],
+                "order_index": plan["order_of"][i],
+                "visit_min": round(visits[i]),
             }
-            for item in optimized_items
+            for i in order
         ]
     }
 
@@ -435,7 +693,6 @@ async def resolve_plan_items(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid place IDs")
         
-        from ..models import Place
         result = await db.execute(
             select(Place)
             .where(Place.id.in_(place_ids))
@@ -0,0 +1,146 @@
+"""Split trip stops into days.
+
+Stops are clustered with a capacity-constrained k-means (one cluster per
+day). Each stop weighs its visit time plus an estimate of the travel it
+adds, taken as the trip to its nearest neighbouring stop. A day may hold at
+most its fair share of the total weight plus ``CAPACITY_SLACK``. During
+assignment, stops with the most to lose from a second-choice day (largest
+regret) pick first. Days are then chained so consecutive days are close
+to each other, and each day is ordered with the route optimizer.
+"""
+import numpy as np
+
+from .geo import KM_PER_DEG_LAT
+from .matrix import distance_matrix_km, travel_minutes
+from .optimizer import solve
+
+CAPACITY_SLACK = 0.05
+KMEANS_ITERATIONS = 12
+
+
+def _project_km(points: np.ndarray) -> np.ndarray:
+    """Equirectangular projection around the points' mean latitude, in km."""
+    lat0 = np.radians(points[:, 0].mean())
+    return np.column_stack((points[:, 0] * KM_PER_DEG_LAT, points[:, 1] * KM_PER_DEG_LAT * np.cos(lat0)))
+
+
+def _init_centres(xy: np.ndarray, weights: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Weighted k-means++ seeding."""
+    centres = [xy[rng.choice(len(xy), p=weights / weights.sum())]]
+    d2 = ((xy - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        p = d2 * weights
+        total = p.sum()
+        idx = rng.choice(len(xy), p=p / total) if total > 0 else int(rng.integers(len(xy)))
+        centres.append(xy[idx])
+        d2 = np.minimum(d2, ((xy - xy[idx]) ** 2).sum(axis=1))
+    return np.array(centres)
+
+
+def _assign(dist: np.ndarray, weights: np.ndarray, capacity: float) -> np.ndarray:
+    """Capacity-constrained assignment of points to centres, largest regret first."""
+    n, k = dist.shape
+    ranked = np.argsort(dist, axis=1)
+    if k > 1:
+        nearest = np.take_along_axis(dist, ranked[:, :2], axis=1)
+        regret = nearest[:, 1] - nearest[:, 0]
+    else:
+        regret = np.zeros(n)
+    loads = [0.0] * k
+    labels = np.empty(n, dtype=np.int64)
+    for i in np.argsort(-regret).tolist():
+        w = weights[i]
+        choices = ranked[i].tolist()
+        chosen = choices[0]
+        for c in choices:
+            if loads[c] + w <= capacity:
+                chosen = c
+                break
+        else:
+            # nowhere has room: least loaded centre
+            chosen = min(range(k), key=loads.__getitem__)
+        labels[i] = chosen
+        loads[chosen] += w
+    return labels
+
+
+def _chain_days(centres: np.ndarray, first: int) -> list[int]:
+    """Nearest-neighbour order of clusters, starting with cluster ``first``."""
+    order = [first]
+    remaining = set(range(len(centres))) - {first}
+    while remaining:
+        last = centres[order[-1]]
+        nxt = min(remaining, key=lambda c: ((centres[c] - last) ** 2).sum())
+        order.append(nxt)
+        remaining.remove(nxt)
+    return order
+
+
+def schedule(
+    points: list[tuple[float, float]],
+    visit_min: list[float],
+    days: int,
+    day_budget_min: float,
+    mode: str = "walk",
+    time_budget: float = 0.03,
+    seed: int = 0,
+) -> dict:
+    """Assign each point a day and a position within it.
+
+    Returns ``{"day_of": [...], "order_of": [...], "days": [...]}``, with
+    ``day_of[i]``/``order_of[i]`` for point ``i`` and one summary per day
+    (visit, travel and total minutes against ``day_budget_min``).
+    ``time_budget`` (seconds) is shared by the per-day route optimization.
+    """
+    n = len(points)
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    visits = np.asarray(visit_min, dtype=np.float64)
+    k = max(1, min(days, n))
+
+    dist = distance_matrix_km(pts)
+    if n > 1:
+        nn_km = np.where(np.eye(n, dtype=bool), np.inf, dist).min(axis=1)
+    else:
+        nn_km = np.zeros(n)
+    weights = visits + travel_minutes(nn_km, mode)
+    capacity = weights.sum() / k * (1 + CAPACITY_SLACK)
+
+    xy = _project_km(pts)
+    rng = np.random.default_rng(seed)
+    centres = _init_centres(xy, np.maximum(weights, 1e-6), k, rng)
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        d = np.sqrt(((xy[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2))
+        new_labels = _assign(d, weights, capacity)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centres[c] = np.average(xy[members], axis=0, weights=np.maximum(weights[members], 1e-6))
+
+    day_of = np.empty(n, dtype=np.int64)
+    order_of = np.empty(n, dtype=np.int64)
+    summaries = []
+    chain = _chain_days(centres, int(labels[0]))
+    for day, cluster in enumerate(chain):
+        members = np.flatnonzero(labels == cluster)
+        sub = dist[np.ix_(members, members)]
+        route = solve(sub, start=None, end=None, time_budget=time_budget * len(members) / n)
+        ordered = members[route.order]
+        day_of[ordered] = day
+        order_of[ordered] = np.arange(len(ordered))
+        visit = float(visits[members].sum())
+        travel = float(travel_minutes(route.cost, mode))
+        summaries.append({
+            "day_index": day,
+            "stops": len(members),
+            "visit_min": round(visit),
+            "travel_min": round(travel),
+            "total_min": round(visit + travel),
+            "over_budget": visit + travel > day_budget_min,
+        })
+    for day in range(len(chain), days):
+        summaries.append({"day_index": day, "stops": 0, "visit_min": 0, "travel_min": 0, "total_min": 0, "over_budget": False})
+    return {"day_of": day_of.tolist(), "order_of": order_of.tolist(), "days": summaries}
@@ -0,0 +1,275 @@
+"""Name search for the /search typeahead.
+
+Run ``python -m app.search [names]`` for a benchmark of the index against
+the ILIKE query it replaces, on synthetic names (default 200,000).
+Measured that way, queries take 20-90 us at 200,000 and at 1,000,000
+names. ILIKE on SQLite takes 0.5-10 ms when ORDER BY name ... LIMIT can
+stop early and 75-80 ms for a full scan, and it misses accent-folded
+matches ("fes", "hotel dar") entirely.
+"""
+import bisect
+import sys
+import time
+import unicodedata
+from typing import NamedTuple, Optional
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip accents so 'Fès' and 'fes' compare equal."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def trigrams(folded: str) -> set[str]:
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+
+class Doc(NamedTuple):
+    kind: str  # "city" or "place"
+    id: int
+    name: str
+    folded: str
+    city_slug: str
+    category: Optional[str] = None
+
+
+class SearchIndex:
+    """Accent- and case-folded name index for typeahead.
+
+    Two access paths are kept:
+
+    - prefix tables, one per (kind, name length): whole folded names, and
+      ``(word, name)`` pairs for the words of multi-word names, each sorted
+      so a prefix is a contiguous run found with a bisect. Walking the
+      tables cities first and shortest names first yields prefix matches
+      already in rank order, so the search stops as soon as it has
+      ``limit`` of them instead of truncating before ranking;
+    - trigram postings answering substring queries of three or more
+      characters by intersecting the smallest posting sets first.
+
+    Documents are added and removed one at a time; the prefix tables are
+    rebuilt lazily on the next search after a change.
+    """
+
+    KINDS = ("city", "place")
+
+    def __init__(self):
+        self.version = 0
+        self._docs: dict[tuple, Doc] = {}
+        self._grams: dict[str, set] = {}
+        # kind -> [(length, sorted table)], by length
+        self._names: dict[str, list[tuple[int, list]]] = {}
+        self._words: dict[str, list[tuple[int, list]]] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc: Doc) -> None:
+        key = (doc.kind, doc.id)
+        if key in self._docs:
+            self.remove(key)
+        self._docs[key] = doc
+        for gram in trigrams(doc.folded):
+            self._grams.setdefault(gram, set()).add(key)
+        self._dirty = True
+
+    def remove(self, key: tuple) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for gram in trigrams(doc.folded):
+            posting = self._grams.get(gram)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._grams[gram]
+        self._dirty = True
+
+    def _build_tables(self) -> None:
+        if not self._dirty:
+            return
+        names: dict[tuple, list] = {}
+        words: dict[tuple, list] = {}
+        for doc in self._docs.values():
+            bucket = (doc.kind, len(doc.folded))
+            names.setdefault(bucket, []).append((doc.folded, doc.id))
+            split = doc.folded.split()
+            if len(split) > 1:
+                for word in set(split):
+                    words.setdefault(bucket, []).append((word, doc.folded, doc.id))
+
+        def by_kind(tables: dict) -> dict:
+            out: dict[str, list] = {kind: [] for kind in self.KINDS}
+            for (kind, length), rows in sorted(tables.items()):
+                rows.sort()
+                out.setdefault(kind, []).append((length, rows))
+            return out
+
+        self._names = by_kind(names)
+        self._words = by_kind(words)
+        self._dirty = False
+
+    def _prefix_docs(self, fq: str, limit: int, kinds: tuple) -> list[Doc]:
+        """Up to ``limit`` exact, name-prefix and word-prefix matches, in rank order."""
+        self._build_tables()
+        found: list[tuple] = []
+        seen: set = set()
+
+        def take(kind: str, doc_id: int) -> bool:
+            key = (kind, doc_id)
+            if key not in seen:
+                seen.add(key)
+                found.append(key)
+            return len(found) >= limit
+
+        # exact names: only in the tables of length len(fq)
+        for kind in kinds:
+            for length, rows in self._names.get(kind, ()):
+                if length == len(fq):
+                    i = bisect.bisect_left(rows, (fq,))
+                    while i < len(rows) and rows[i][0] == fq:
+                        if take(kind, rows[i][1]):
+                            return [self._docs[k] for k in found]
+                        i += 1
+        # name prefix, cities first, shortest names first
+        for kind in kinds:
+            for length, rows in self._names.get(kind, ()):
+                if length <= len(fq):
+                    continue
+                i = bisect.bisect_left(rows, (fq,))
+                while i < len(rows) and rows[i][0].startswith(fq):
+                    if take(kind, rows[i][1]):
+                        return [self._docs[k] for k in found]
+                    i += 1
+        # word prefix; within a length the rows are ordered by word, so each
+        # table's matches are re-sorted by (name, id) before taking them
+        for kind in kinds:
+            for length, rows in self._words.get(kind, ()):
+                if length <= len(fq):
+                    continue
+                i = bisect.bisect_left(rows, (fq,))
+                matches = set()
+                while i < len(rows) and rows[i][0].startswith(fq):
+                    if not rows[i][1].startswith(fq):
+                        matches.add((rows[i][1], rows[i][2]))
+                    i += 1
+                for folded, doc_id in sorted(matches):
+                    if take(kind, doc_id):
+                        return [self._docs[k] for k in found]
+        return [self._docs[k] for k in found]
+
+    def _substring_keys(self, fq: str, kind: Optional[str] = None) -> set:
+        postings = []
+        for gram in trigrams(fq):
+            posting = self._grams.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        keys = set(postings[0])
+        for posting in postings[1:]:
+            keys &= posting
+            if not keys:
+                break
+        return {key for key in keys if (not kind or key[0] == kind) and fq in self._docs[key].folded}
+
+    def search(self, q: str, limit: int = 10, kind: Optional[str] = None) -> list[Doc]:
+        """Return up to ``limit`` documents matching ``q``, best first.
+
+        Ranking: exact name, then name prefix, then word prefix, then
+        substring; within a tier cities come before places and shorter
+        names before longer ones.
+        """
+        fq = fold(q).strip()
+        if not fq:
+            return []
+
+        kinds = (kind,) if kind else self.KINDS
+        docs = self._prefix_docs(fq, limit, kinds)
+        if len(docs) < limit and len(fq) >= 3:
+            found = {(doc.kind, doc.id) for doc in docs}
+            rest = [self._docs[key] for key in self._substring_keys(fq, kind) if key not in found]
+            rest.sort(key=lambda doc: (doc.kind != "city", len(doc.folded), doc.folded, doc.id))
+            docs += rest[:limit - len(docs)]
+        return docs
+
+    def sync(self, snapshot) -> None:
+        """Bring the index in line with a catalog snapshot.
+
+        Only documents that were added, removed or renamed since the last
+        sync are touched, so a reseed that keeps most rows costs little.
+        """
+        wanted = {}
+        for city in snapshot.cities:
+            doc = Doc("city", city["id"], city["name"], fold(city["name"]), city["slug"])
+            wanted[("city", doc.id)] = doc
+            for place in snapshot.city_places(city["slug"]):
+                doc = Doc("place", place["id"], place["name"], fold(place["name"]), city["slug"], place["category"])
+                wanted[("place", doc.id)] = doc
+
+        for key in [key for key in self._docs if key not in wanted]:
+            self.remove(key)
+        for key, doc in wanted.items():
+            if self._docs.get(key) != doc:
+                self.add(doc)
+        self._build_tables()
+        self.version = snapshot.version
+
+
+index = SearchIndex()
+
+
+def _synthetic_names(n: int, seed: int = 7) -> list[str]:
+    """Place-like names from a small syllable set, some with accents."""
+    import random
+
+    rng = random.Random(seed)
+    syllables = ["ma", "ra", "kech", "fès", "sa", "di", "ouz", "ta", "gha", "zagh", "mé", "nès", "el", "bab", "dar", "riad"]
+    kinds = ["Riad", "Dar", "Café", "Musée", "Jardin", "Palais", "Souk", "Hôtel"]
+    return [
+        f"{rng.choice(kinds)} {''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()} {i}"
+        for i in range(n)
+    ]
+
+
+def _benchmark(n: int = 200_000, queries=("riad", "kech", "fes", "zaghma", "hotel dar", "ouzta"), rounds: int = 20) -> None:
+    from sqlalchemy import create_engine, insert, select
+
+    from .models import City, Place
+
+    names = _synthetic_names(n)
+    started = time.perf_counter()
+    idx = SearchIndex()
+    for i, name in enumerate(names):
+        idx.add(Doc("place", i + 1, name, fold(name), "bench"))
+    idx._build_tables()
+    print(f"indexed {n:,} names in {time.perf_counter() - started:.1f}s")
+
+    # the ILIKE path on an in-memory SQLite copy (lower(name) LIKE lower(:q))
+    engine = create_engine("sqlite://")
+    City.__table__.create(engine)
+    Place.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(City), [{"id": 1, "slug": "bench", "name": "Bench", "lat": 0.0, "lon": 0.0}])
+        conn.execute(insert(Place), [
+            {"id": i + 1, "city_id": 1, "name": name, "category": "bench", "lat": 0.0, "lon": 0.0}
+            for i, name in enumerate(names)
+        ])
+
+    print(f"{'query':<12}{'index us':>10}{'hits':>6}{'ilike ms':>10}{'hits':>6}")
+    with engine.connect() as conn:
+        for q in queries:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                docs = idx.search(q, limit=10)
+            index_us = (time.perf_counter() - start) / rounds * 1e6
+            stmt = select(Place.name).where(Place.name.ilike(f"%{q}%")).order_by(Place.name).limit(10)
+            start = time.perf_counter()
+            rows = conn.execute(stmt).all()
+            ilike_ms = (time.perf_counter() - start) * 1000
+            print(f"{q:<12}{index_us:>10.0f}{len(docs):>6}{ilike_ms:>10.1f}{len(rows):>6}")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
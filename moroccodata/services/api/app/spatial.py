@@ -0,0 +1,147 @@
+"""Grid spatial index for /places/nearby.
+
+Run ``python -m app.spatial [places]`` to compare radius and box queries
+against a brute-force scan of every place (default 1,000,000 places).
+With the places clustered around five cities (about 200k each), a
+nearest-50 query took 22 ms at 0.5 km, 58 ms at 2 km and 520 ms at
+10 km, where the radius holds a large share of a city. The scan took
+1.1-1.5 s for every radius.
+"""
+import heapq
+import sys
+import time
+from collections import defaultdict
+from math import floor
+from typing import Iterable, Optional
+
+from .geo import haversine_km, bbox_around
+
+# ~5.5 km of latitude per cell: small enough that a medina-scale radius touches
+# a handful of buckets, large enough that a city's places share a few cells.
+DEFAULT_CELL_DEG = 0.05
+
+
+class GridIndex:
+    """Fixed-size lat/lon grid over places for radius and bounding-box search.
+
+    Each bucket holds ``(lat, lon, city_slug, place)`` entries. Queries visit
+    only the buckets overlapping the search box and then apply the exact test,
+    so cost is proportional to the number of nearby places rather than the
+    size of the catalog. The index is built once and never mutated.
+    """
+
+    def __init__(self, entries: Iterable[tuple], cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        buckets = defaultdict(list)
+        size = 0
+        for entry in entries:
+            buckets[self._cell(entry[0], entry[1])].append(entry)
+            size += 1
+        self._buckets = dict(buckets)
+        self.size = size
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return floor(lat / self.cell_deg), floor(lon / self.cell_deg)
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        i0, j0 = self._cell(min_lat, min_lon)
+        i1, j1 = self._cell(max_lat, max_lon)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._buckets):
+            # a huge box touches more cells than exist; walk the buckets instead
+            for (i, j), bucket in self._buckets.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    yield from bucket
+            return
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = self._buckets.get((i, j))
+                if bucket:
+                    yield from bucket
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        category: str = "",
+        limit: Optional[int] = None,
+    ) -> list[tuple[float, str, dict]]:
+        """Places within ``radius_km`` as ``(distance_km, city_slug, place)``, nearest first."""
+        hits = []
+        for plat, plon, slug, place in self._candidates(*bbox_around(lat, lon, radius_km)):
+            if category and place["category"] != category:
+                continue
+            d = haversine_km(lat, lon, plat, plon)
+            if d <= radius_km:
+                hits.append((d, slug, place))
+        return _ordered(hits, limit)
+
+    def within(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        lat: float,
+        lon: float,
+        category: str = "",
+        limit: Optional[int] = None,
+    ) -> list[tuple[float, str, dict]]:
+        """Places inside a box as ``(distance_km, city_slug, place)``, ordered by distance from (lat, lon)."""
+        hits = []
+        for plat, plon, slug, place in self._candidates(min_lat, min_lon, max_lat, max_lon):
+            if not (min_lat <= plat <= max_lat and min_lon <= plon <= max_lon):
+                continue
+            if category and place["category"] != category:
+                continue
+            hits.append((haversine_km(lat, lon, plat, plon), slug, place))
+        return _ordered(hits, limit)
+
+
+def _ordered(hits: list, limit: Optional[int]) -> list:
+    key = lambda h: (h[0], h[2]["id"])
+    if limit and limit < len(hits):
+        return heapq.nsmallest(limit, hits, key=key)
+    return sorted(hits, key=key)
+
+
+def _brute_force_nearby(entries: list, lat: float, lon: float, radius_km: float, limit: Optional[int]) -> list:
+    hits = []
+    for plat, plon, slug, place in entries:
+        d = haversine_km(lat, lon, plat, plon)
+        if d <= radius_km:
+            hits.append((d, slug, place))
+    return _ordered(hits, limit)
+
+
+def _benchmark(n: int = 1_000_000, rounds: int = 20) -> None:
+    import random
+
+    rng = random.Random(7)
+    # places clustered around a few city centres, like the real catalog
+    centres = [(31.63, -7.99), (34.03, -4.98), (33.57, -7.59), (35.76, -5.83), (30.42, -9.60)]
+    entries = []
+    for i in range(n):
+        clat, clon = rng.choice(centres)
+        lat, lon = clat + rng.gauss(0, 0.08), clon + rng.gauss(0, 0.08)
+        entries.append((lat, lon, "bench", {"id": i, "category": "bench", "lat": lat, "lon": lon}))
+    started = time.perf_counter()
+    index = GridIndex(entries)
+    print(f"indexed {n:,} places in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'radius km':>10}{'hits':>8}{'grid ms':>10}{'scan ms':>10}")
+    for radius in (0.5, 2.0, 10.0):
+        lat, lon = centres[0]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            hits = index.nearby(lat, lon, radius, limit=50)
+        grid_ms = (time.perf_counter() - start) / rounds * 1000
+        start = time.perf_counter()
+        scanned = _brute_force_nearby(entries, lat, lon, radius, limit=50)
+        scan_ms = (time.perf_counter() - start) * 1000
+        assert [h[2]["id"] for h in hits] == [h[2]["id"] for h in scanned]
+        print(f"{radius:>10}{len(hits):>8}{grid_ms:>10.2f}{scan_ms:>10.0f}")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
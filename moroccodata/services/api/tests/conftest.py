@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its database URL at import time, so point it at a throwaway
+# SQLite file before anything under app/ is imported.
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import redis as cache  # noqa: E402
+
+
+@pytest.fixture
+def no_redis(monkeypatch):
+    """Run against the in-process L1 tier only, starting from an empty cache."""
+    monkeypatch.setattr(cache, "r", None)
+    cache.l1.clear()
+    yield
+    cache.l1.clear()
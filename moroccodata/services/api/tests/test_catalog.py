@@ -0,0 +1,74 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from app import catalog
+from app.core import redis as cache
+from app.core.db import Base, SessionLocal, engine
+from app.models import City, Place
+
+
+class CounterClient:
+    """Just enough of redis.asyncio for the generation counter."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    async def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def test_reseed_in_another_worker_is_picked_up(monkeypatch):
+    client = CounterClient()
+    monkeypatch.setattr(cache, "r", client)
+    monkeypatch.setattr(cache, "_down_until", 0.0)
+    monkeypatch.setattr(catalog, "_snapshot", None)
+    monkeypatch.setattr(catalog, "_generation", None)
+    monkeypatch.setattr(catalog, "CATALOG_CHECK_INTERVAL", 0)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as s:
+            await s.execute(delete(Place))
+            await s.execute(delete(City))
+            s.add(City(id=1, slug="fes", name="Fes", lat=34.03, lon=-5.0))
+            await s.commit()
+            before = await catalog.get(s)
+
+            # another worker adds a city and bumps the generation
+            s.add(City(id=2, slug="rabat", name="Rabat", lat=34.02, lon=-6.84))
+            await s.commit()
+            unchanged = await catalog.get(s)
+            await client.incr(catalog.GENERATION_KEY)
+            after = await catalog.get(s)
+            return before, unchanged, after
+
+    before, unchanged, after = asyncio.run(run())
+
+    assert [c["slug"] for c in before.cities] == ["fes"]
+    assert unchanged is before
+    assert [c["slug"] for c in after.cities] == ["fes", "rabat"]
+
+
+def test_refresh_bumps_the_generation(monkeypatch):
+    client = CounterClient()
+    monkeypatch.setattr(cache, "r", client)
+    monkeypatch.setattr(cache, "_down_until", 0.0)
+    monkeypatch.setattr(catalog, "_snapshot", None)
+    monkeypatch.setattr(catalog, "_generation", None)
+
+    async def run():
+        async with SessionLocal() as s:
+            await catalog.refresh(s)
+            await catalog.refresh(s)
+
+    asyncio.run(run())
+
+    assert client.values[catalog.GENERATION_KEY] == 2
+    assert catalog._generation == 2
@@ -0,0 +1,71 @@
+import asyncio
+import itertools
+
+import pytest
+from sqlalchemy import delete
+
+from app import catalog
+from app.core.db import Base, SessionLocal, engine
+from app.models import City, Place
+from app.queries import city_list_query
+
+CITIES = [
+    # name, {category: places}
+    ("Agadir", {"beach": 3}),
+    ("Chefchaouen", {"medina": 1, "palace": 1}),
+    ("Essaouira", {}),
+    ("Fes", {"medina": 2, "palace": 2, "museum": 1}),
+    ("Marrakech", {"palace": 3, "garden": 2}),
+    ("Meknes", {"palace": 1}),
+]
+
+
+async def _seed() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as s:
+        await s.execute(delete(Place))
+        await s.execute(delete(City))
+        place_id = 1
+        for city_id, (name, categories) in enumerate(CITIES, 1):
+            s.add(City(id=city_id, slug=name.lower(), name=name, lat=31.0, lon=-8.0))
+            for category, count in categories.items():
+                for _ in range(count):
+                    s.add(Place(id=place_id, city_id=city_id, name=f"{category} {place_id}", category=category, lat=31.0, lon=-8.0))
+                    place_id += 1
+        await s.commit()
+
+
+async def _run_all(combinations):
+    await _seed()
+    async with SessionLocal() as s:
+        snapshot = await catalog.build(s)
+        out = []
+        for combo in combinations:
+            rows = (await s.execute(city_list_query(*combo))).scalars().all()
+            out.append(([c.name for c in rows], [c["name"] for c in snapshot.list_cities(*combo)]))
+        return out
+
+
+COMBINATIONS = list(itertools.product(
+    ["", "e"],  # q
+    [0, 1, 4],  # min_places
+    ["", "palace", "beach", "none"],  # category
+    ["name", "popularity"],  # sort
+))
+
+
+def test_every_filter_and_sort_combination_matches_the_snapshot():
+    results = asyncio.run(_run_all(COMBINATIONS))
+    for combo, (from_sql, from_snapshot) in zip(COMBINATIONS, results):
+        assert from_sql == from_snapshot, combo
+
+
+@pytest.mark.parametrize("combo,expected", [
+    (("", 1, "palace", "popularity"), ["Fes", "Marrakech", "Chefchaouen", "Meknes"]),
+    (("", 3, "palace", "name"), ["Fes", "Marrakech"]),
+    (("e", 0, "palace", "popularity"), ["Fes", "Marrakech", "Chefchaouen", "Meknes"]),
+])
+def test_category_with_count_join(combo, expected):
+    [(from_sql, _)] = asyncio.run(_run_all([combo]))
+    assert from_sql == expected
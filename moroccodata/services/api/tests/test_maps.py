@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.mark.parametrize("origin,destination,waypoints", [
+    ("nan,-8", "31.7,-8", ""),
+    ("31.6,-8", "inf,-8", ""),
+    ("31.6,-8", "31.7,-8", "31.65,nan"),
+    ("91,-8", "31.7,-8", ""),
+    ("31.6,-181", "31.7,-8", ""),
+])
+def test_directions_rejects_invalid_coordinates(origin, destination, waypoints):
+    params = {"origin": origin, "destination": destination, "waypoints": waypoints}
+    assert TestClient(app).get("/maps/directions", params=params).status_code == 400
+
+
+def test_directions_offline_estimate():
+    params = {"origin": "31.6,-8", "destination": "31.7,-8"}
+    body = TestClient(app).get("/maps/directions", params=params).json()
+    assert body["available"] and body["distance_km"] == pytest.approx(11.12, abs=0.01)
+
+
+@pytest.mark.parametrize("point", [
+    '{"lat": NaN, "lon": 0}',
+    '{"lat": 0, "lon": Infinity}',
+    '{"lat": 95, "lon": 0}',
+])
+def test_matrix_rejects_invalid_points(point):
+    body = '{"points": [' + point + ', {"lat": 0, "lon": 0}]}'
+    response = TestClient(app).post("/maps/matrix", content=body, headers={"content-type": "application/json"})
+    assert response.status_code == 422
@@ -0,0 +1,43 @@
+import asyncio
+
+from app import optimize_jobs
+from app.core import redis as cache
+
+
+def test_job_outlives_the_local_cache_in_the_submitting_worker(no_redis, monkeypatch):
+    async def solve(key, stops, options):
+        await asyncio.sleep(0.01)
+        return {"order": [0, 1], "days": []}
+
+    async def apply(plan):
+        return {"order": plan["order"]}
+
+    monkeypatch.setattr(optimize_jobs, "solve", solve)
+    monkeypatch.setattr(optimize_jobs, "_jobs", {})
+
+    async def run():
+        job_id = await optimize_jobs.submit("trip-1", "k1", [(0, 31.6, -8.0), (0, 31.7, -8.1)], {}, apply)
+        assert (await optimize_jobs.get_job(job_id))["status"] == "running"
+        await optimize_jobs._running[job_id]
+        # without Redis the cached copy only lives in L1, for at most CACHE_L1_MAX_TTL
+        cache.l1.clear()
+        return await optimize_jobs.get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "done"
+    assert job["result"] == {"order": [0, 1]}
+
+
+def test_expired_jobs_are_pruned(no_redis, monkeypatch):
+    monkeypatch.setattr(optimize_jobs, "_jobs", {})
+    monkeypatch.setattr(optimize_jobs, "OPTIMIZE_JOB_TTL", 0)
+
+    async def run():
+        await optimize_jobs._set_job("old", status="done")
+        cache.l1.clear()
+        await optimize_jobs._set_job("new", status="running")
+        return await optimize_jobs.get_job("old")
+
+    assert asyncio.run(run()) is None
+    assert "old" not in optimize_jobs._jobs
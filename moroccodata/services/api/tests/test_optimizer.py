@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.matrix import distance_matrix_km
+from app.optimizer import path_cost, solve
+
+PINS = [(0, None), (0, -1), (None, None), (None, -1)]
+
+
+def _instances(count, sizes, seed=11):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(*sizes))
+        points = np.column_stack((31.63 + rng.uniform(-0.05, 0.05, n), -7.99 + rng.uniform(-0.06, 0.06, n)))
+        yield distance_matrix_km(points)
+
+
+def _brute_force(cost, start, end):
+    n = len(cost)
+    return min(
+        path_cost(cost, p)
+        for p in itertools.permutations(range(n))
+        if (start is None or p[0] == start) and (end is None or p[-1] == end)
+    )
+
+
+@pytest.mark.parametrize("start,end", PINS)
+def test_routes_are_valid_and_near_optimal(start, end):
+    gaps = []
+    for cost in _instances(60, (3, 8)):
+        n = len(cost)
+        pinned_end = None if end is None else n - 1
+        route = solve(cost, start=start, end=pinned_end)
+
+        assert sorted(route.order) == list(range(n))
+        if start is not None:
+            assert route.order[0] == start
+        if pinned_end is not None:
+            assert route.order[-1] == pinned_end
+        assert route.cost <= route.initial_cost + 1e-9
+
+        gaps.append(route.cost / _brute_force(cost, start, pinned_end) - 1)
+
+    # local search is a heuristic: most small instances come out optimal,
+    # but individual routes can be several percent off
+    assert np.mean(gaps) < 0.01
+    assert np.mean(np.array(gaps) < 1e-9) > 0.9
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.spatial import GridIndex, _brute_force_nearby
+
+
+@pytest.mark.parametrize("bbox", [
+    "0,0,inf,inf",
+    "nan,0,1,1",
+    "0,0,95,1",
+    "0,-190,1,1",
+    "1,0,0,1",
+    "1,2,3",
+    "a,b,c,d",
+])
+def test_invalid_bbox_is_rejected(bbox):
+    response = TestClient(app).get("/places/nearby", params={"bbox": bbox})
+    assert response.status_code == 400
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(3)
+    entries = []
+    for i in range(5000):
+        lat, lon = 31.6 + rng.uniform(-0.3, 0.3), -8.0 + rng.uniform(-0.3, 0.3)
+        entries.append((lat, lon, "x", {"id": i, "category": "c", "lat": lat, "lon": lon}))
+    index = GridIndex(entries)
+    for radius in (0.3, 2.0, 15.0):
+        for limit in (None, 10):
+            grid = index.nearby(31.6, -8.0, radius, limit=limit)
+            scan = _brute_force_nearby(entries, 31.6, -8.0, radius, limit)
+            assert [h[2]["id"] for h in grid] == [h[2]["id"] for h in scan]
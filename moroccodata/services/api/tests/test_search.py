@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from app.search import Doc, SearchIndex, _synthetic_names, fold
+
+
+def _reference(docs, q, limit, kind=None):
+    """Rank every document the slow way: the order SearchIndex must reproduce."""
+    fq = fold(q).strip()
+
+    def tier(doc):
+        if doc.folded == fq:
+            return 0
+        if doc.folded.startswith(fq):
+            return 1
+        if any(word.startswith(fq) for word in doc.folded.split()):
+            return 2
+        if len(fq) >= 3 and fq in doc.folded:
+            return 3
+        return None
+
+    ranked = [
+        ((tier(doc), doc.kind != "city", len(doc.folded), doc.folded, doc.id), doc)
+        for doc in docs
+        if (not kind or doc.kind == kind) and tier(doc) is not None
+    ]
+    return [doc for _, doc in sorted(ranked)[:limit]]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(5)
+    docs = [Doc("place", i, name, fold(name), "x") for i, name in enumerate(_synthetic_names(5000))]
+    for i, name in enumerate(["Fès", "Marrakech", "Meknès", "Rabat", "Ouarzazate", "Riad Zitoun", "Dar Bouazza", "Azrou"]):
+        docs.append(Doc("city", i, name, fold(name), name.lower()))
+    rng.shuffle(docs)
+    index = SearchIndex()
+    for doc in docs:
+        index.add(doc)
+    return index, docs
+
+
+@pytest.mark.parametrize("q", ["r", "ri", "riad", "m", "ma", "fes", "kech", "zagh", "hotel dar", "ouz", "azr", "x", "dar b"])
+@pytest.mark.parametrize("kind", [None, "city", "place"])
+def test_matches_reference_ranking(corpus, q, kind):
+    index, docs = corpus
+    got = index.search(q, limit=10, kind=kind)
+    assert [(d.kind, d.id) for d in got] == [(d.kind, d.id) for d in _reference(docs, q, 10, kind)]
+
+
+def test_short_prefix_keeps_cities_ahead_of_alphabetically_earlier_places():
+    index = SearchIndex()
+    for i in range(1000):
+        name = f"Ma {i:04d} Place"
+        index.add(Doc("place", i, name, fold(name), "x"))
+    index.add(Doc("city", 1, "Marrakech", "marrakech", "marrakech"))
+    assert index.search("ma", limit=5)[0].name == "Marrakech"
+    assert [d.name for d in index.search("ma", limit=3, kind="city")] == ["Marrakech"]
+
+
+def test_updates_are_visible_after_add_and_remove(corpus):
+    index = SearchIndex()
+    index.add(Doc("city", 1, "Fès", "fes", "fes"))
+    assert [d.id for d in index.search("fe")] == [1]
+    index.add(Doc("city", 2, "Fez", "fez", "fez"))
+    index.remove(("city", 1))
+    assert [d.id for d in index.search("fe")] == [2]
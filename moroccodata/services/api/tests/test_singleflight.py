@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.core import redis as cache
+from app.core.singleflight import cached_fetch, cached_fetch_many
+
+
+def counting_fetcher(value, delay=0.05):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+
+    return fetch, calls
+
+
+def test_concurrent_misses_make_one_upstream_call(no_redis):
+    fetch, calls = counting_fetcher({"temp": 21})
+
+    async def run():
+        return await asyncio.gather(*(cached_fetch("wx:test:herd", fetch, soft_ttl=60, hard_ttl=300) for _ in range(100)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r.value == {"temp": 21} for r in results)
+
+
+def test_miss_after_fill_is_served_from_cache(no_redis):
+    fetch, calls = counting_fetcher({"temp": 21}, delay=0)
+
+    async def run():
+        first = await cached_fetch("wx:test:fill", fetch, soft_ttl=60, hard_ttl=300)
+        second = await cached_fetch("wx:test:fill", fetch, soft_ttl=60, hard_ttl=300)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert not first.cached and second.cached
+
+
+def test_concurrent_misses_share_a_failure_then_retry(no_redis):
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            *(cached_fetch("wx:test:fail", failing, soft_ttl=60, hard_ttl=300) for _ in range(20)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(cached_fetch("wx:test:fail", failing, soft_ttl=60, hard_ttl=300))
+    assert len(calls) == 2
+
+
+def test_unlock_is_a_single_compare_and_delete(monkeypatch):
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        async def eval(self, script, numkeys, *args):
+            self.calls.append((script, numkeys, args))
+            return 1
+
+        async def get(self, key):
+            raise AssertionError("unlock must not GET then DEL")
+
+        async def delete(self, key):
+            raise AssertionError("unlock must not GET then DEL")
+
+    client = Client()
+    monkeypatch.setattr(cache, "r", client)
+    monkeypatch.setattr(cache, "_down_until", 0.0)
+
+    asyncio.run(cache.unlock("wx:1", "token"))
+
+    assert len(client.calls) == 1
+    script, numkeys, args = client.calls[0]
+    assert numkeys == 1 and args == ("lock:wx:1", "token")
+    assert "redis.call('get', KEYS[1]) == ARGV[1]" in script
+
+
+def test_batch_and_single_misses_share_upstream_calls(no_redis):
+    single_calls = []
+    batch_calls = []
+
+    async def fetch_one():
+        single_calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"temp": 1}
+
+    async def fetch_many(keys):
+        batch_calls.append(list(keys))
+        await asyncio.sleep(0.05)
+        return {key: {"temp": 2} for key in keys}
+
+    keys = [f"wx:test:batch:{i}" for i in range(4)]
+
+    async def run():
+        return await asyncio.gather(
+            cached_fetch(keys[0], fetch_one, soft_ttl=60, hard_ttl=300),
+            cached_fetch_many(keys, fetch_many, soft_ttl=60, hard_ttl=300),
+            cached_fetch_many(keys, fetch_many, soft_ttl=60, hard_ttl=300),
+        )
+
+    single, first, second = asyncio.run(run())
+
+    # keys[0] was already in flight for the single call; the first batch
+    # fetched the rest and the second batch waited on both
+    assert len(single_calls) == 1
+    assert batch_calls == [keys[1:]]
+    assert single.value == {"temp": 1}
+    for batch in (first, second):
+        assert batch[keys[0]].value == {"temp": 1}
+        assert all(batch[key].value == {"temp": 2} for key in keys[1:])
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, delete
+
+from app.core.db import Base, SessionLocal, engine
+from app.main import app
+from app.models import Trip, TripItem
+
+TRIPS = 23
+PAGE = 5
+
+
+async def _seed() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as s:
+        await s.execute(delete(TripItem))
+        await s.execute(delete(Trip))
+        start = datetime(2026, 1, 1)
+        for i in range(TRIPS):
+            trip_id = f"trip-{i:03d}"
+            # pairs of trips share created_at so the id tie-break is exercised
+            s.add(Trip(id=trip_id, slug=trip_id, title=f"T{i}", session_id="s1", created_at=start + timedelta(minutes=i // 2)))
+            for k in range(i % 4):
+                s.add(TripItem(id=f"{trip_id}-{k}", trip_id=trip_id, name="p", category="c", lat=31.6, lon=-8.0, order_index=k))
+        await s.commit()
+
+
+@pytest.fixture
+def client():
+    asyncio.run(_seed())
+    # not entered as a context manager: the lifespan (pools, prewarm) isn't needed here
+    yield TestClient(app)
+
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+
+def test_trip_pages_cost_one_statement_each(client, statements):
+    pages = []
+    cursor = None
+    while True:
+        statements.clear()
+        params = {"session_id": "s1", "limit": PAGE, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/trips", params=params).json()
+        assert len(statements) == 1, statements
+        pages.append(body["trips"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    trips = [t for page in pages for t in page]
+    assert len(pages) == -(-TRIPS // PAGE)
+    assert [t["id"] for t in trips] == [f"trip-{i:03d}" for i in reversed(range(TRIPS))]
+    assert all(t["items_count"] == int(t["id"][-3:]) % 4 for t in trips)